@@ -0,0 +1,124 @@
+"""
+Response formats for the tabular endpoints.
+
+Clients pick a format with the Accept header:
+    application/json                     (default) list of records
+    application/msgpack                  the same records, MessagePack-encoded (needs msgpack)
+    application/vnd.apache.arrow.stream  Arrow IPC stream built straight from the query
+                                         DataFrame, with no per-row Python dicts (needs pyarrow)
+
+compress_response gzip- or brotli-encodes (brotli needs the brotli package) any response
+body over COMPRESSION_MIN_SIZE bytes that the client accepts.
+"""
+import gzip
+import os
+
+import numpy as np
+import pandas as pd
+from fastapi import Response
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+
+# Accept values mapped to the format they select
+ACCEPTED_TYPES = {
+    MSGPACK: MSGPACK,
+    "application/x-msgpack": MSGPACK,
+    ARROW_STREAM: ARROW_STREAM,
+    JSON: JSON,
+}
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def negotiate(request):
+    """Return the response format the client asked for; JSON unless a binary type is listed first."""
+    accept = request.headers.get("accept", "")
+    for part in accept.split(","):
+        media_type = part.split(";")[0].strip().lower()
+        if media_type in ACCEPTED_TYPES:
+            return ACCEPTED_TYPES[media_type]
+    return JSON
+
+
+def clean_records(df):
+    """The JSON-safe records the endpoints have always returned (inf and NaN become None)."""
+    df = df.replace([np.inf, -np.inf], np.nan)
+    df = df.astype(object).where(pd.notnull(df), None)
+    return df.to_dict(orient='records')
+
+
+def _unavailable(media_type, package):
+    return Response(
+        content=f'{{"error": "{media_type} responses need the {package} package on the server."}}',
+        status_code=406,
+        media_type=JSON,
+    )
+
+
+def render_table(request, df, headers=None):
+    """
+    Render a query result in the negotiated format. JSON responses are returned as plain
+    records so FastAPI encodes them as before; binary formats come back as a Response.
+    """
+    response_format = negotiate(request)
+
+    if response_format == ARROW_STREAM:
+        if pa is None:
+            return _unavailable(ARROW_STREAM, "pyarrow")
+        table = pa.Table.from_pandas(df.replace([np.inf, -np.inf], np.nan), preserve_index=False)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return Response(content=sink.getvalue().to_pybytes(), media_type=ARROW_STREAM, headers=headers)
+
+    if response_format == MSGPACK:
+        if msgpack is None:
+            return _unavailable(MSGPACK, "msgpack")
+        body = msgpack.packb(clean_records(df), default=str, use_bin_type=True)
+        return Response(content=body, media_type=MSGPACK, headers=headers)
+
+    return clean_records(df)
+
+
+def compress_response(request, body, headers):
+    """
+    Compress body when it is large enough and the client accepts br or gzip.
+    Returns the (possibly new) body and updates headers in place.
+    """
+    headers["vary"] = "Accept, Accept-Encoding"
+    if len(body) < COMPRESSION_MIN_SIZE or "content-encoding" in headers:
+        return body
+
+    accepted = {part.split(";")[0].strip().lower() for part in request.headers.get("accept-encoding", "").split(",")}
+    if "br" in accepted and brotli is not None:
+        body, encoding = brotli.compress(body, quality=BROTLI_QUALITY), "br"
+    elif "gzip" in accepted:
+        body, encoding = gzip.compress(body, compresslevel=GZIP_LEVEL), "gzip"
+    else:
+        return body
+
+    headers["content-encoding"] = encoding
+    headers["content-length"] = str(len(body))
+    # The representation differs per encoding, so the validator becomes weak
+    if "etag" in headers and not headers["etag"].startswith("W/"):
+        headers["etag"] = "W/" + headers["etag"]
+    return body
@@ -0,0 +1,163 @@
+"""
+Household premiums for every plan in a state, computed with NumPy.
+
+A state's rate rows are turned once into two plan x age matrices (ages 0..MAX_AGE): the
+non-tobacco rate and the tobacco rate for each (plan, rating area). Pricing a household is
+then a column gather and a row sum, and pricing a batch of households is one matrix
+product of per-age member counts with the rate matrices.
+
+Household rules follow the federal family rating rules: each member is charged the rate
+for their age (the tobacco rate for tobacco users, falling back to the standard rate when
+the plan has no tobacco surcharge), and only the three oldest children under 21 are charged.
+
+States that rate by family tier instead of age (e.g. NY and VT, whose rate_puf rows have
+Age "Family Option") are priced from the tier columns (Couple,
+PrimarySubscriberAndOneDependent, ...). The first member is the primary subscriber, the
+second a spouse when 21 or over, and everyone else a dependent; tobacco use is not rated.
+"""
+import numpy as np
+import pandas as pd
+
+MAX_AGE = 120
+CHILD_AGE_LIMIT = 21
+MAX_CHARGED_CHILDREN = 3
+
+# rate_puf columns of "Family Option" rows, in family_tier() order:
+# single, subscriber + 1/2/3+ dependents, couple, couple + 1/2/3+ dependents
+FAMILY_TIERS = [
+    "IndividualRate",
+    "PrimarySubscriberAndOneDependent",
+    "PrimarySubscriberAndTwoDependents",
+    "PrimarySubscriberAndThreeOrMoreDependents",
+    "Couple",
+    "CoupleAndOneDependent",
+    "CoupleAndTwoDependents",
+    "CoupleAndThreeOrMoreDependents",
+]
+
+
+class RateMatrix:
+    def __init__(self, rates, plan_details=None):
+        """
+        Build the matrices from rate_puf rows for one state (PlanId, RatingAreaId, AgeMin,
+        AgeMax, IndividualRate, IndividualTobaccoRate, plus the FAMILY_TIERS columns).
+        Rows without age bounds are the state's "Family Option" family-tier rates.
+        plan_details, one row per PlanId (e.g. DentalOnlyPlan and MarketCoverage from
+        plan_attributes_puf), is joined onto plans so callers can filter by plan kind.
+        """
+        if "RateEffectiveDate" in rates.columns:
+            # Plans can have several rate periods; keep the latest one
+            rates = rates.assign(_effective=pd.to_datetime(rates["RateEffectiveDate"], errors="coerce"))
+            rates = rates.sort_values("_effective", kind="stable")
+        family = rates[rates["AgeMin"].isna()].drop_duplicates(subset=["PlanId", "RatingAreaId"], keep="last")
+        rates = rates.dropna(subset=["AgeMin", "AgeMax"])
+        rates = rates.drop_duplicates(subset=["PlanId", "RatingAreaId", "AgeMin", "AgeMax"], keep="last")
+
+        keys = pd.concat([rates, family])[["PlanId", "RatingAreaId"]].drop_duplicates().reset_index(drop=True)
+        key_index = pd.MultiIndex.from_frame(keys)
+        row = key_index.get_indexer(pd.MultiIndex.from_frame(rates[["PlanId", "RatingAreaId"]]))
+
+        self.family = np.full((len(keys), len(FAMILY_TIERS)), np.nan)
+        family_row = key_index.get_indexer(pd.MultiIndex.from_frame(family[["PlanId", "RatingAreaId"]]))
+        for tier, column in enumerate(FAMILY_TIERS):
+            if column in family.columns:
+                self.family[family_row, tier] = pd.to_numeric(family[column], errors="coerce").to_numpy(dtype=float)
+        self._family_rows = np.zeros(len(keys), dtype=bool)
+        self._family_rows[family_row] = True
+
+        self.plans = keys.assign(
+            IssuerId=keys["PlanId"].astype(str).str[:5],
+            rating=np.where(self._family_rows, "family_tier", "age"),
+        )
+        if plan_details is not None:
+            details = plan_details.drop_duplicates(subset=["PlanId"]).astype({"PlanId": keys["PlanId"].dtype})
+            self.plans = self.plans.merge(details, on="PlanId", how="left")
+
+        age_min = rates["AgeMin"].to_numpy(dtype=int).clip(0, MAX_AGE)
+        age_max = rates["AgeMax"].to_numpy(dtype=int).clip(0, MAX_AGE)
+        standard = pd.to_numeric(rates["IndividualRate"], errors="coerce").to_numpy(dtype=float)
+        tobacco = pd.to_numeric(rates["IndividualTobaccoRate"], errors="coerce").to_numpy(dtype=float)
+        tobacco = np.where(np.isnan(tobacco), standard, tobacco)
+
+        # Expand each age band to one cell per age
+        band_sizes = np.maximum(age_max - age_min + 1, 0)
+        band_starts = np.cumsum(band_sizes) - band_sizes
+        band_rows = np.repeat(row, band_sizes)
+        band_ages = np.repeat(age_min - band_starts, band_sizes) + np.arange(band_sizes.sum())
+
+        self.standard = np.full((len(keys), MAX_AGE + 1), np.nan)
+        self.tobacco = np.full((len(keys), MAX_AGE + 1), np.nan)
+        self.standard[band_rows, band_ages] = np.repeat(standard, band_sizes)
+        self.tobacco[band_rows, band_ages] = np.repeat(tobacco, band_sizes)
+
+        # Missing cells (a plan without a rate for an age) are tracked separately so the
+        # matrix products below stay NaN-free
+        self._missing_standard = np.isnan(self.standard).astype(float)
+        self._missing_tobacco = np.isnan(self.tobacco).astype(float)
+        self._standard = np.nan_to_num(self.standard)
+        self._tobacco = np.nan_to_num(self.tobacco)
+
+    def __len__(self):
+        return len(self.plans)
+
+    def price(self, ages, tobacco=None):
+        """Total monthly premium of one household for every plan row (NaN where a member's age is unrated)."""
+        return self.price_batch([(ages, tobacco)])[0]
+
+    def price_batch(self, households):
+        """
+        Premiums for many households at once: an array of shape (households, plan rows).
+        households is a list of (ages, tobacco flags or None).
+        """
+        standard_counts, tobacco_counts = member_counts(households)
+        totals = standard_counts @ self._standard.T + tobacco_counts @ self._tobacco.T
+        missing = standard_counts @ self._missing_standard.T + tobacco_counts @ self._missing_tobacco.T
+        totals[missing > 0] = np.nan
+        if self._family_rows.any():
+            tiers = np.array([family_tier(ages) for ages, _ in households], dtype=int)
+            totals[:, self._family_rows] = self.family[self._family_rows][:, tiers].T
+        return totals
+
+    def rank(self, ages, tobacco=None):
+        """Plan rows with the household's premium, cheapest first; plans that can't price it are dropped."""
+        result = self.plans.assign(premium=self.price(ages, tobacco))
+        return result.dropna(subset=["premium"]).sort_values(["premium", "PlanId", "RatingAreaId"], kind="stable")
+
+
+def family_tier(ages):
+    """Index into FAMILY_TIERS for a household listed subscriber first, then spouse."""
+    couple = len(ages) > 1 and ages[1] >= CHILD_AGE_LIMIT
+    dependents = len(ages) - (2 if couple else 1)
+    return 4 * couple + min(dependents, 3)
+
+
+def member_counts(households):
+    """
+    Charged members per age for each household, as two (households, ages) count arrays
+    (non-tobacco and tobacco). Everyone 21 and over is charged, plus the three oldest
+    children under 21.
+    """
+    # Flatten to one entry per member, tagged with its household's position
+    member_ages, member_tobacco = [], []
+    for ages, tobacco in households:
+        member_ages.extend(ages)
+        member_tobacco.extend(tobacco if tobacco is not None else [False] * len(ages))
+    sizes = np.array([len(ages) for ages, _ in households], dtype=int)
+    household = np.repeat(np.arange(len(households)), sizes)
+    ages = np.clip(np.array(member_ages, dtype=int), 0, MAX_AGE)
+    tobacco = np.array(member_tobacco, dtype=bool)
+
+    # Within each household, oldest first; count children in that order to find the three oldest
+    order = np.lexsort((-ages, household))
+    household, ages, tobacco = household[order], ages[order], tobacco[order]
+    child = ages < CHILD_AGE_LIMIT
+    children_so_far = np.cumsum(child)
+    household_starts = np.cumsum(sizes) - sizes
+    children_before = np.repeat(np.r_[0, children_so_far][household_starts], sizes)
+    charged = ~child | (children_so_far - children_before <= MAX_CHARGED_CHILDREN)
+
+    cells = len(households) * (MAX_AGE + 1)
+    slot = household * (MAX_AGE + 1) + ages
+    standard_counts = np.bincount(slot[charged & ~tobacco], minlength=cells).reshape(len(households), MAX_AGE + 1)
+    tobacco_counts = np.bincount(slot[charged & tobacco], minlength=cells).reshape(len(households), MAX_AGE + 1)
+    return standard_counts.astype(float), tobacco_counts.astype(float)
@@ -1,19 +1,38 @@
 import os 
-from fastapi import FastAPI, Depends
+import re
+import time
+import hashlib
+from typing import Literal, Optional
+from fastapi import FastAPI, Depends, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
 from sqlalchemy import create_engine, text
 from dotenv import load_dotenv
 import pandas as pd
-import numpy as np
+
+from formats import JSON, clean_records, compress_response, negotiate, render_table
+from household import RateMatrix
+from singleflight import SingleFlight
 
 
 dotenv_path = os.path.join(os.path.dirname(__file__), '..', '.env')
 load_dotenv(dotenv_path=dotenv_path)
 
+# Imported after load_dotenv: the profiling settings may come from .env
+from profiling import (PROFILING_DIR, PROFILING_ENABLED, ProfiledRoute, profiling,
+                       requested_token, store_report, valid_token)
+
 app = FastAPI()
+# Set before any route is declared so every endpoint can be profiled
+app.router.route_class = ProfiledRoute
 
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Seconds to trust the cached data version before re-reading it
+DATA_VERSION_TTL = int(os.getenv("DATA_VERSION_TTL", "30"))
+_data_version = {"version": None, "checked_at": 0.0}
+
 def get_db():
     engine = create_engine(DATABASE_URL)
     try:
@@ -21,195 +40,582 @@ def get_db():
     finally:
         engine.dispose()
 
+# Identical queries that are in flight at the same time run once and share the result
+query_flights = SingleFlight()
+
+def read_sql(query, engine, params=None):
+    """
+    pd.read_sql_query with single-flight coalescing on (query, params).
+    Concurrent callers may receive the same DataFrame, so treat it as read-only.
+    """
+    key = (str(query), tuple(sorted((params or {}).items())))
+    return query_flights.do(key, lambda: pd.read_sql_query(query, engine, params=params))
+
+def get_data_version(engine):
+    """
+    Return the data version bumped by scripts/refresh_data.py on every refresh.
+    Caches can include it in their keys so entries expire when the data changes.
+    """
+    now = time.monotonic()
+    if _data_version["version"] is None or now - _data_version["checked_at"] > DATA_VERSION_TTL:
+        try:
+            with engine.connect() as conn:
+                version = conn.execute(text("SELECT version FROM data_version;")).scalar()
+        except Exception:
+            # Tables loaded with load_data_pgs.py only have no version marker yet
+            version = 0
+        _data_version["version"] = version or 0
+        _data_version["checked_at"] = now
+    return _data_version["version"]
+
+_version_engine = None
+
+# Live counters that must never be answered with 304
+NO_ETAG_PATHS = {"/stats/queries"}
+
+@app.middleware("http")
+async def etag_revalidation(request: Request, call_next):
+    """
+    Tag GET responses with an ETag derived from the data version, URL and requested
+    format, and answer If-None-Match with 304 Not Modified without running any queries.
+    Tags change whenever scripts/refresh_data.py publishes new data.
+    """
+    global _version_engine
+    if request.method != "GET" or request.url.path in NO_ETAG_PATHS:
+        return await call_next(request)
+
+    if _version_engine is None:
+        _version_engine = create_engine(DATABASE_URL)
+    version = await run_in_threadpool(get_data_version, _version_engine)
+    url_hash = hashlib.sha1(f"{request.url} {negotiate(request)}".encode()).hexdigest()[:16]
+    etag = f'"{version}-{url_hash}"'
+
+    # Weak comparison: compressed responses carry the same tag marked W/
+    if request.headers.get("if-none-match", "").removeprefix("W/") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    response = await call_next(request)
+    if response.status_code != 200:
+        return response
+
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    headers = dict(response.headers)
+    # Error payloads (e.g. a transient database error) must not be revalidated as current
+    if not body.startswith(b'{"error"'):
+        headers["ETag"] = etag
+    return Response(content=body, status_code=response.status_code, headers=headers, media_type=response.media_type)
+
+# Registered after etag_revalidation so it runs outside it and compresses the final body
+@app.middleware("http")
+async def compression(request: Request, call_next):
+    """gzip/brotli-encode response bodies over formats.COMPRESSION_MIN_SIZE bytes."""
+    response = await call_next(request)
+    if response.status_code == 304:
+        return response
+
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    headers = dict(response.headers)
+    body = compress_response(request, body, headers)
+    return Response(content=body, status_code=response.status_code, headers=headers, media_type=response.media_type)
+
+# Registered last so it runs outermost and profiles the whole request
+@app.middleware("http")
+async def request_profiling(request: Request, call_next):
+    """
+    Run a request under the sampling profiler when it carries the profiling token
+    (X-Profile header or ?profile=) and PROFILING_ENABLED is set. See profiling.py.
+    """
+    token = requested_token(request)
+    if not PROFILING_ENABLED or token is None:
+        return await call_next(request)
+    if not valid_token(token):
+        return JSONResponse({"error": "Invalid profiling token."}, status_code=403)
+
+    with profiling() as profile:
+        response = await call_next(request)
+        body = b"".join([chunk async for chunk in response.body_iterator])
+    report = profile.report(request, response.status_code, len(body))
+
+    if PROFILING_DIR:
+        headers = dict(response.headers)
+        headers["X-Profile-Report"] = await run_in_threadpool(store_report, report)
+        return Response(content=body, status_code=response.status_code, headers=headers, media_type=response.media_type)
+    return JSONResponse(report, headers={"Cache-Control": "no-store"})
+
 @app.get("/")
 def read_root():
     return {"message": "CMS Healthcare API Running!"}
 
+@app.get("/data-version")
+def read_data_version(engine=Depends(get_db)):
+    return {"data_version": get_data_version(engine)}
+
+@app.get("/stats/queries")
+def read_query_stats():
+    """Counts of queries executed and of requests that shared an in-flight query."""
+    return query_flights.stats()
+
 #get plans and info by state code
 @app.get("/plans/{state_code}")
-def get_plans(state_code: str, engine=Depends(get_db)):
+def get_plans(state_code: str, request: Request, engine=Depends(get_db)):
     query = text('SELECT * FROM plan_attributes_puf WHERE "StateCode" = :state LIMIT 20;')
-    df = pd.read_sql_query(query, engine, params={"state": state_code.upper()})
+    df = read_sql(query, engine, params={"state": state_code.upper()})
     if df.empty:
         return {"error": f"State code '{state_code.upper()}' not found in the database"}
-    df = df.replace([np.inf, -np.inf], np.nan)
-    df = df.astype(object).where(pd.notnull(df), None)
-    return df.to_dict(orient='records')
+    return render_table(request, df)
 
 
 # Get insurance rate data for a specific state and age
 # Returns rate information from rate_puf table including premium rates and other rate factors
+# Ages match numerically against the AgeMin/AgeMax bounds, so 10 finds the "0-14" band
 @app.get("/rates/{state_code}/{age}")
-def get_rates(state_code: str, age: int, engine=Depends(get_db)):
+def get_rates(state_code: str, age: int, request: Request, engine=Depends(get_db)):
     query = text('''
         SELECT * FROM rate_puf
         WHERE "StateCode" = :state
-        AND "Age" = :age
+        AND "AgeMin" <= :age AND "AgeMax" >= :age
         LIMIT 20;
     ''')
     try:
-        df = pd.read_sql_query(query, engine, params={"state": state_code.upper(), "age": str(age)})
+        df = read_sql(query, engine, params={"state": state_code.upper(), "age": age})
         
         if df.empty:
             return {"error": f"No rate data found for state {state_code.upper()} and age {age}."}
             
-        df = df.replace([np.inf, -np.inf], np.nan).astype(object).where(pd.notnull(df), None)
-        return df.to_dict(orient='records')
+        return render_table(request, df)
     except Exception as e:
         return {"error": f"Database error: {str(e)}"}
 
 
 #gets issuers IDs for a specific state
 @app.get("/issuers/{state_code}")
-def get_issuers(state_code: str, engine=Depends(get_db)):
+def get_issuers(state_code: str, request: Request, engine=Depends(get_db)):
     query = text('''
         SELECT DISTINCT "IssuerId"
         FROM plan_attributes_puf
         WHERE "StateCode" = :state;
     ''')
     try:
-        df = pd.read_sql_query(query, engine, params={"state": state_code.upper()})
+        df = read_sql(query, engine, params={"state": state_code.upper()})
         
         if df.empty:
             return {"error": f"No issuers found for state {state_code.upper()}."}
             
-        df = df.astype(object).where(pd.notnull(df), None)
-        return df.to_dict(orient='records')
+        return render_table(request, df)
     except Exception as e:
         return {"error": f"Database error: {str(e)}"}
 
 
 @app.get("/transparency/{issuer_id}")
-def get_transparency(issuer_id: str, engine = Depends(get_db)):
+def get_transparency(issuer_id: str, request: Request, engine = Depends(get_db)):
     query = text('SELECT * FROM transparency_in_coverage_puf_indqhp WHERE "Issuer_ID" = :issuer LIMIT 20;')
     try:
-        df = pd.read_sql_query(query, engine, params={"issuer": issuer_id})
+        df = read_sql(query, engine, params={"issuer": issuer_id})
         if df.empty:
             return {"error": f"No transparency data found for issuer ID {issuer_id}."}
-        df = df.replace([np.inf, -np.inf], np.nan)
-        df = df.astype(object).where(pd.notnull(df), None)
-        return df.to_dict(orient='records')
+        return render_table(request, df)
     except Exception as e:
         return {"error": f"Database error: {str(e)}"}
 
+# transparency_fact market -> the response key clients have always used for it
+MARKET_KEYS = {"QHP": "indqhp", "SADP": "ind_sadp", "SHOP": "shop"}
+
 @app.get("/all-transparency/{issuer_id}")
-def get_all_transparency(issuer_id: str, engine = Depends(get_db)):
+def get_all_transparency(issuer_id: str, request: Request, engine = Depends(get_db)):
     """
-    Get transparency data from all three transparency tables for a given issuer ID.
+    Get transparency data from every market for a given issuer ID.
+    Reads the consolidated transparency_fact table with one indexed query,
+    returning up to 50 plans per market, each from its latest loaded plan year.
     """
-    all_data = {}
-    
-    # Check transparency_in_coverage_puf_indqhp table
-    try:
-        query = text('SELECT * FROM transparency_in_coverage_puf_indqhp WHERE "Issuer_ID" = :issuer LIMIT 50;')
-        df = pd.read_sql_query(query, engine, params={"issuer": issuer_id})
-        if not df.empty:
-            df = df.replace([np.inf, -np.inf], np.nan)
-            df = df.astype(object).where(pd.notnull(df), None)
-            all_data["indqhp"] = df.to_dict(orient='records')
-    except Exception as e:
-        all_data["indqhp_error"] = f"Database error: {str(e)}"
-    
-    # Check transparency_2025_ind_sadp table
+    query = text('''
+        SELECT * FROM (
+            SELECT *, ROW_NUMBER() OVER (PARTITION BY market ORDER BY "Plan_ID") AS market_row
+            FROM (
+                SELECT *, ROW_NUMBER() OVER (
+                    PARTITION BY market, "Plan_ID" ORDER BY plan_year DESC NULLS LAST
+                ) AS plan_row
+                FROM transparency_fact
+                WHERE "Issuer_ID" = :issuer
+            ) plan_rows
+            WHERE plan_row = 1
+        ) issuer_rows
+        WHERE market_row <= 50
+        ORDER BY market, market_row;
+    ''')
     try:
-        query = text('SELECT * FROM transparency_2025_ind_sadp WHERE "Issuer_ID" = :issuer LIMIT 50;')
-        df = pd.read_sql_query(query, engine, params={"issuer": issuer_id})
-        if not df.empty:
-            df = df.replace([np.inf, -np.inf], np.nan)
-            df = df.astype(object).where(pd.notnull(df), None)
-            all_data["ind_sadp"] = df.to_dict(orient='records')
+        df = read_sql(query, engine, params={"issuer": issuer_id})
     except Exception as e:
-        all_data["ind_sadp_error"] = f"Database error: {str(e)}"
-    
-    # Check transparency_2025_shop table
-    try:
-        query = text('SELECT * FROM transparency_2025_shop WHERE "Issuer_ID" = :issuer LIMIT 50;')
-        df = pd.read_sql_query(query, engine, params={"issuer": issuer_id})
-        if not df.empty:
-            df = df.replace([np.inf, -np.inf], np.nan)
-            df = df.astype(object).where(pd.notnull(df), None)
-            all_data["shop"] = df.to_dict(orient='records')
-    except Exception as e:
-        all_data["shop_error"] = f"Database error: {str(e)}"
+        return {"error": f"Database error: {str(e)}"}
     
-    # Check if we found any data
-    if not all_data or (len(all_data) == 0 or 
-                        (len(all_data) == 3 and 
-                         "indqhp_error" in all_data and 
-                         "ind_sadp_error" in all_data and 
-                         "shop_error" in all_data)):
+    if df.empty:
         return {"error": f"No transparency data found for issuer ID {issuer_id} in any table."}
+    df = df.drop(columns=["market_row", "plan_row"])
+    
+    # Binary formats carry one table; rows keep their market column
+    if negotiate(request) != JSON:
+        return render_table(request, df)
     
+    all_data = {}
+    for market, rows in df.groupby("market", sort=False):
+        all_data[MARKET_KEYS.get(market, market.lower())] = clean_records(rows)
     return all_data
 
 @app.get("/rate-by-plan/{plan_id}/{age}")
-def get_rate_by_plan(plan_id: str, age: int, engine=Depends(get_db)):
+def get_rate_by_plan(plan_id: str, age: int, request: Request, engine=Depends(get_db)):
     """
     Get rate data for a specific plan ID and age.
     This endpoint helps match plan IDs from transparency data with rate information.
     
     First tries exact match, then attempts partial matching as a fallback.
     """
+    # HIOS plan IDs embed the state code (e.g. 12345TX0010001). Filtering on it lets
+    # Postgres prune rate_puf down to that state's partition.
+    plan_state = plan_id[5:7].upper() if len(plan_id) >= 7 and plan_id[5:7].isalpha() else None
+    state_filter = 'AND "StateCode" = :state' if plan_state else ''
+
     # First try exact match
-    exact_query = text('''
+    exact_query = text(f'''
         SELECT * FROM rate_puf
         WHERE "PlanId" = :plan_id
-        AND "Age" = :age
+        AND "AgeMin" <= :age AND "AgeMax" >= :age
+        {state_filter}
         AND ("Tobacco" = 'No' OR "Tobacco" = 'Tobacco User/Non-Tobacco User')
         LIMIT 5;
     ''')
     
     try:
-        df = pd.read_sql_query(exact_query, engine, params={"plan_id": plan_id, "age": str(age)})
+        df = read_sql(exact_query, engine, params={"plan_id": plan_id, "age": age, "state": plan_state})
         
         # If exact match found, return it
         if not df.empty:
-            df = df.replace([np.inf, -np.inf], np.nan).astype(object).where(pd.notnull(df), None)
-            return df.to_dict(orient='records')
+            return render_table(request, df)
             
         # If no exact match, try partial match (uses first 10 characters of plan ID)
         # This is often effective as plan IDs may have variations but share a common prefix
         if len(plan_id) >= 10:
             plan_prefix = plan_id[:10]
-            partial_query = text('''
+            partial_query = text(f'''
                 SELECT * FROM rate_puf
                 WHERE "PlanId" LIKE :plan_prefix || '%'
-                AND "Age" = :age
+                AND "AgeMin" <= :age AND "AgeMax" >= :age
+                {state_filter}
                 AND ("Tobacco" = 'No' OR "Tobacco" = 'Tobacco User/Non-Tobacco User')
                 LIMIT 5;
             ''')
             
-            df = pd.read_sql_query(partial_query, engine, params={
+            df = read_sql(partial_query, engine, params={
                 "plan_prefix": plan_prefix, 
-                "age": str(age)
+                "age": age,
+                "state": plan_state
             })
             
             if not df.empty:
-                df = df.replace([np.inf, -np.inf], np.nan).astype(object).where(pd.notnull(df), None)
-                return df.to_dict(orient='records')
+                return render_table(request, df)
                 
         # If still no match, try a more flexible match using issuer ID if present in the plan ID
         # Extract issuer ID from the plan ID if possible (typically first 5 digits)
         if len(plan_id) >= 5:
             issuer_id = plan_id[:5]
-            issuer_query = text('''
+            issuer_query = text(f'''
                 SELECT * FROM rate_puf
                 WHERE "PlanId" LIKE :issuer_id || '%' 
-                AND "Age" = :age
+                AND "AgeMin" <= :age AND "AgeMax" >= :age
+                {state_filter}
                 AND ("Tobacco" = 'No' OR "Tobacco" = 'Tobacco User/Non-Tobacco User')
                 LIMIT 10;
             ''')
             
-            df = pd.read_sql_query(issuer_query, engine, params={
+            df = read_sql(issuer_query, engine, params={
                 "issuer_id": issuer_id, 
-                "age": str(age)
+                "age": age,
+                "state": plan_state
             })
             
             if not df.empty:
-                df = df.replace([np.inf, -np.inf], np.nan).astype(object).where(pd.notnull(df), None)
-                return df.to_dict(orient='records')
+                return render_table(request, df)
         
         # No matches found
         return {"error": f"No rate data found for plan ID {plan_id} and age {age}."}
     except Exception as e:
-        return {"error": f"Database error: {str(e)}"}
\ No newline at end of file
+        return {"error": f"Database error: {str(e)}"}
+
+# plan_rankings holds a row per plan for ages 0..RANKING_MAX_AGE (the open "64 and over"
+# rate band ends at 120, see scripts/clean_data.py)
+RANKING_MAX_AGE = 120
+
+@app.get("/rankings/{state_code}/{age}")
+def get_rankings(
+    state_code: str,
+    age: int,
+    request: Request,
+    sort_by: Literal["denial_rate", "resubmission_rate", "premium", "value_score"] = "value_score",
+    metal_level: Optional[str] = None,
+    plan_type: Optional[Literal["QHP", "SADP", "SHOP"]] = None,
+    max_premium: Optional[float] = None,
+    limit: int = Query(10, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    engine=Depends(get_db),
+):
+    """
+    Top plans for a state and age ranked by quality and cost (lower is better).
+
+    Reads the plan_rankings table built at load time, which has one row per plan and age
+    with the premium and value score precomputed and an index on (state_code, age, key)
+    for every sort key, so the ranking is an index-ordered scan that stops at the limit.
+    The value score is premium / (1 - denial rate), i.e. the cost per approved claim.
+    Premium is the plan's lowest non-tobacco rate for the age across rating areas, matched
+    by exact plan ID or by a 10-character prefix shared with a single rate plan (see
+    premium_match); plans without a premium sort last and fail max_premium.
+    issuer_min_premium, the issuer's lowest rate for the age, is informational only.
+    """
+    filters = ['state_code = :state', 'age = :age']
+    params = {"state": state_code.upper(), "age": min(max(age, 0), RANKING_MAX_AGE),
+              "limit": limit, "offset": offset}
+    if metal_level:
+        filters.append('LOWER(metal_level) = LOWER(:metal_level)')
+        params["metal_level"] = metal_level
+    if plan_type:
+        filters.append('market = :market')
+        params["market"] = plan_type
+    if max_premium is not None:
+        filters.append('premium <= :max_premium')
+        params["max_premium"] = max_premium
+    where = " AND ".join(filters)
+
+    # sort_by is validated against the indexed column names above
+    query = text(f'''
+        SELECT market AS plan_type, issuer_id, issuer_name, plan_id, plan_name, metal_level,
+               denial_rate, resubmission_rate, out_of_network_pct, premium, premium_match, issuer_min_premium,
+               value_score
+        FROM plan_rankings
+        WHERE {where}
+        ORDER BY {sort_by} NULLS LAST, plan_id
+        LIMIT :limit OFFSET :offset;
+    ''')
+    # Counted separately so the page query can stop at the limit
+    count_query = text(f'''
+        SELECT COUNT(*) AS total FROM plan_rankings WHERE {where};
+    ''')
+    try:
+        df = read_sql(query, engine, params=params)
+        if df.empty and offset == 0:
+            return {"error": f"No ranked plans found for state {state_code.upper()} with the given filters."}
+
+        total = int(read_sql(count_query, engine, params=params)["total"].iloc[0])
+        if negotiate(request) != JSON:
+            # Binary formats carry only the result rows; paging details go in headers
+            return render_table(request, df, headers={
+                "X-Total-Count": str(total), "X-Limit": str(limit), "X-Offset": str(offset),
+            })
+        return {
+            "state": state_code.upper(),
+            "age": age,
+            "sort_by": sort_by,
+            "total": total,
+            "limit": limit,
+            "offset": offset,
+            "results": clean_records(df),
+        }
+    except Exception as e:
+        return {"error": f"Database error: {str(e)}"}
+
+
+# County-level availability, answered from the plan_availability table built at load
+# time (one indexed lookup on state, county and ZIP; no joins at request time)
+def county_filter(zip_code):
+    # Rows with a ZipCode only cover part of the county; keep them when no ZIP is given
+    return 'AND ("ZipCode" IS NULL OR "ZipCode" = :zip)' if zip_code else ''
+
+@app.get("/county-plans/{state_code}/{county_fips}")
+def get_county_plans(state_code: str, county_fips: str, request: Request, zip: Optional[str] = None,
+                     engine=Depends(get_db)):
+    """
+    Plans sold in a county (5-digit FIPS code), optionally narrowed to a ZIP code.
+    PartialCounty is true for plans whose service area covers only some of the county's ZIPs.
+    """
+    query = text(f'''
+        SELECT "IssuerId", "PlanId", "PlanMarketingName", "MetalLevel", "PlanType",
+               "MarketCoverage", "DentalOnlyPlan", "ServiceAreaId",
+               MIN("ZipCode") IS NOT NULL AS "PartialCounty"
+        FROM plan_availability
+        WHERE "StateCode" = :state
+        AND "County" = :county
+        {county_filter(zip)}
+        GROUP BY "IssuerId", "PlanId", "PlanMarketingName", "MetalLevel", "PlanType",
+                 "MarketCoverage", "DentalOnlyPlan", "ServiceAreaId"
+        ORDER BY "IssuerId", "PlanId";
+    ''')
+    params = {"state": state_code.upper(), "county": county_fips.zfill(5), "zip": zip}
+    try:
+        df = read_sql(query, engine, params=params)
+        if df.empty:
+            return {"error": f"No plans found for county {county_fips} in state {state_code.upper()}."}
+        return render_table(request, df)
+    except Exception as e:
+        return {"error": f"Database error: {str(e)}"}
+
+@app.get("/county-issuers/{state_code}/{county_fips}")
+def get_county_issuers(state_code: str, county_fips: str, request: Request, zip: Optional[str] = None,
+                       engine=Depends(get_db)):
+    """Issuer IDs with at least one plan sold in a county, optionally narrowed to a ZIP code."""
+    query = text(f'''
+        SELECT DISTINCT "IssuerId"
+        FROM plan_availability
+        WHERE "StateCode" = :state
+        AND "County" = :county
+        {county_filter(zip)}
+        ORDER BY "IssuerId";
+    ''')
+    params = {"state": state_code.upper(), "county": county_fips.zfill(5), "zip": zip}
+    try:
+        df = read_sql(query, engine, params=params)
+        if df.empty:
+            return {"error": f"No issuers found for county {county_fips} in state {state_code.upper()}."}
+        return render_table(request, df)
+    except Exception as e:
+        return {"error": f"Database error: {str(e)}"}
+
+
+MAX_BENEFIT_TERMS = 10
+
+def benefit_search_name(term):
+    # Same normalization as benefit_names.search_name (load_data_pgs.benefit_search_name)
+    return re.sub(r"[^a-z0-9]+", " ", term.lower()).strip()
+
+@app.get("/benefit-search/{state_code}")
+def search_benefits(state_code: str, request: Request, benefit: list[str] = Query(...), engine=Depends(get_db)):
+    """
+    Plans in a state that cover every requested benefit, e.g.
+    /benefit-search/TX?benefit=acupuncture&benefit=chiropractic.
+    Each term matches any benefit name containing it (case and punctuation are ignored).
+    Uses the benefit_names / benefit_postings index built at load time: the terms are
+    matched against the distinct benefit names, and only those benefits' posting lists
+    are read and intersected.
+    """
+    terms = [benefit_search_name(term) for term in benefit]
+    if not all(terms):
+        return {"error": "Benefit terms must contain letters or digits."}
+    if len(terms) > MAX_BENEFIT_TERMS:
+        return {"error": f"At most {MAX_BENEFIT_TERMS} benefit terms can be searched at once."}
+
+    matches = " UNION ALL ".join(
+        f"SELECT {i} AS term, benefit_id FROM benefit_names WHERE search_name LIKE :term{i}"
+        for i in range(len(terms))
+    )
+    query = text(f'''
+        SELECT p."PlanId", p."IssuerId"
+        FROM ({matches}) m
+        JOIN benefit_postings p ON p.benefit_id = m.benefit_id
+        WHERE p."StateCode" = :state
+        GROUP BY p."PlanId", p."IssuerId"
+        HAVING COUNT(DISTINCT m.term) = :term_count
+        ORDER BY p."PlanId";
+    ''')
+    params = {"state": state_code.upper(), "term_count": len(terms)}
+    params.update({f"term{i}": f"%{term}%" for i, term in enumerate(terms)})
+    try:
+        df = read_sql(query, engine, params=params)
+        if df.empty:
+            return {"error": f"No plans in state {state_code.upper()} cover all of: {', '.join(benefit)}."}
+        return render_table(request, df)
+    except Exception as e:
+        return {"error": f"Database error: {str(e)}"}
+
+
+# Household pricing keeps one RateMatrix per state, rebuilt when the data version changes
+_rate_matrices = {}
+
+def state_rate_matrix(state, engine):
+    """
+    The state's plan x age rate matrix, read from rate_puf once per data version, with each
+    plan's DentalOnlyPlan and MarketCoverage from plan_attributes_puf.
+    """
+    version = get_data_version(engine)
+    cached = _rate_matrices.get(state)
+    if cached and cached[0] == version:
+        return cached[1]
+
+    def build():
+        query = text('''
+            SELECT "PlanId", "RatingAreaId", "RateEffectiveDate", "AgeMin", "AgeMax",
+                   "IndividualRate", "IndividualTobaccoRate", "Couple",
+                   "PrimarySubscriberAndOneDependent", "PrimarySubscriberAndTwoDependents",
+                   "PrimarySubscriberAndThreeOrMoreDependents", "CoupleAndOneDependent",
+                   "CoupleAndTwoDependents", "CoupleAndThreeOrMoreDependents"
+            FROM rate_puf
+            WHERE "StateCode" = :state;
+        ''')
+        details_query = text('''
+            SELECT DISTINCT "StandardComponentId" AS "PlanId", "DentalOnlyPlan", "MarketCoverage"
+            FROM plan_attributes_puf
+            WHERE "StateCode" = :state;
+        ''')
+        params = {"state": state}
+        matrix = RateMatrix(pd.read_sql_query(query, engine, params=params),
+                            pd.read_sql_query(details_query, engine, params=params))
+        _rate_matrices[state] = (version, matrix)
+        return matrix
+
+    # Concurrent first requests for a state share one build
+    return query_flights.do(("rate-matrix", state, version), build)
+
+def plan_type_mask(plans, plan_type):
+    """Rows of a RateMatrix plans frame that are of plan_type (QHP, SADP or SHOP)."""
+    dental = plans["DentalOnlyPlan"].str.lower() == "yes"
+    medical = plans["DentalOnlyPlan"].str.lower() == "no"
+    shop = plans["MarketCoverage"].str.lower().str.startswith("shop")
+    individual = plans["MarketCoverage"].str.lower() == "individual"
+    if plan_type == "SADP":
+        return dental
+    return medical & (shop if plan_type == "SHOP" else individual)
+
+@app.get("/household-premiums/{state_code}")
+def get_household_premiums(
+    state_code: str,
+    request: Request,
+    age: list[int] = Query(...),
+    tobacco: list[bool] = Query([]),
+    rating_area: Optional[str] = None,
+    plan_type: Literal["QHP", "SADP", "SHOP"] = "QHP",
+    limit: int = Query(10, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    engine=Depends(get_db),
+):
+    """
+    Total monthly premium of a household for every plan in a state, cheapest first.
+    Pass one age per member (?age=42&age=40&age=9) and optionally one tobacco flag per
+    member in the same order (?tobacco=true&tobacco=false&tobacco=false). Plans are priced
+    per rating area; pass rating_area (e.g. "Rating Area 1") to restrict to one.
+    plan_type picks the plans priced: individual medical plans (QHP, the default),
+    stand-alone dental plans (SADP) or small-group medical plans (SHOP).
+    In family-tier states (e.g. NY, VT; rating "family_tier") the first age is the primary
+    subscriber and the second a spouse when 21 or over; see household.py.
+    """
+    if tobacco and len(tobacco) != len(age):
+        return {"error": "Pass one tobacco flag per age, or none."}
+    try:
+        matrix = state_rate_matrix(state_code.upper(), engine)
+        if len(matrix) == 0:
+            return {"error": f"No rate data found for state {state_code.upper()}."}
+
+        ranked = matrix.rank(age, tobacco or None)
+        if rating_area:
+            ranked = ranked[ranked["RatingAreaId"].str.lower() == rating_area.lower()]
+        ranked = ranked[plan_type_mask(ranked, plan_type)]
+        page = ranked.iloc[offset:offset + limit].reset_index(drop=True)
+        if negotiate(request) != JSON:
+            return render_table(request, page, headers={
+                "X-Total-Count": str(len(ranked)), "X-Limit": str(limit), "X-Offset": str(offset),
+            })
+        return {
+            "state": state_code.upper(),
+            "ages": age,
+            "tobacco": tobacco or [False] * len(age),
+            "plan_type": plan_type,
+            "total": len(ranked),
+            "limit": limit,
+            "offset": offset,
+            "results": clean_records(page),
+        }
+    except Exception as e:
+        return {"error": f"Database error: {str(e)}"}
@@ -0,0 +1,205 @@
+"""
+Opt-in profiling of single API requests on live traffic.
+
+Enabled with PROFILING_ENABLED=1 and a PROFILING_TOKEN. A request carrying the token in
+an X-Profile header (or a ?profile= query parameter) runs under a sampling profiler that
+records the stacks of the threads serving it: the event loop thread (middlewares, JSON
+encoding) and the worker thread running the endpoint (queries, DataFrame cleanup). Every
+SQL statement the request executes is timed as well.
+
+The report holds collapsed stacks (one "frame;frame;frame count" line per stack, ready for
+flamegraph.pl or speedscope), the functions seen in the most samples, and the SQL
+breakdown. With PROFILING_DIR set the report is written there and the normal response is
+returned with an X-Profile-Report header naming the file; otherwise the report replaces
+the response body.
+
+The event loop thread is shared, so samples taken from it can include other requests
+served concurrently.
+"""
+import contextvars
+import functools
+import hmac
+import inspect
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "").lower() in ("1", "true", "yes") and bool(os.getenv("PROFILING_TOKEN"))
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", "")
+PROFILING_DIR = os.getenv("PROFILING_DIR")
+SAMPLE_INTERVAL = float(os.getenv("PROFILING_INTERVAL_MS", "1")) / 1000
+TOP_FUNCTIONS = 30
+
+PROFILE_HEADER = "x-profile"
+PROFILE_PARAM = "profile"
+
+_active_profile = contextvars.ContextVar("active_profile", default=None)
+
+
+def frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def is_idle(frame):
+    # The event loop waiting for I/O between steps of this (or any) request
+    return os.path.basename(frame.f_code.co_filename) == "selectors.py"
+
+
+class Profile:
+    def __init__(self):
+        self.threads = set()
+        self.stacks = Counter()
+        self.sql = []
+        self.samples = 0
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._sampler.start()
+
+    def stop(self):
+        self._stop.set()
+        self._sampler.join()
+        self.wall_ms = (time.perf_counter() - self.started_at) * 1000
+
+    @contextmanager
+    def thread(self):
+        """Sample the calling thread for the duration of the block."""
+        ident = threading.get_ident()
+        self.threads.add(ident)
+        try:
+            yield
+        finally:
+            self.threads.discard(ident)
+
+    def _run(self):
+        while not self._stop.wait(SAMPLE_INTERVAL):
+            frames = sys._current_frames()
+            for ident in list(self.threads):
+                frame = frames.get(ident)
+                if frame is None or is_idle(frame):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame_label(frame))
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+                self.samples += 1
+
+    def report(self, request, status_code, body_size):
+        functions = Counter()
+        for stack, count in self.stacks.items():
+            # Inclusive counts: each function once per sample, however deep the recursion
+            for label in set(stack.split(";")):
+                functions[label] += count
+        sql_ms = sum(query["ms"] for query in self.sql)
+        return {
+            "method": request.method,
+            "path": request.url.path,
+            "query": re.sub(rf"(^|&){PROFILE_PARAM}=[^&]*", "", request.url.query).lstrip("&"),
+            "status_code": status_code,
+            "response_bytes": body_size,
+            "wall_ms": round(self.wall_ms, 2),
+            "sample_interval_ms": SAMPLE_INTERVAL * 1000,
+            "samples": self.samples,
+            "sql": {
+                "statements": len(self.sql),
+                "total_ms": round(sql_ms, 2),
+                "queries": self.sql,
+            },
+            "top_functions": [
+                {"function": label, "samples": count, "pct": round(100 * count / self.samples, 1)}
+                for label, count in functions.most_common(TOP_FUNCTIONS)
+            ] if self.samples else [],
+            "collapsed": [f"{stack} {count}" for stack, count in self.stacks.most_common()],
+        }
+
+
+def requested_token(request):
+    """The profiling token the request carries, or None when it doesn't ask to be profiled."""
+    return request.headers.get(PROFILE_HEADER) or request.query_params.get(PROFILE_PARAM)
+
+
+def valid_token(token):
+    return hmac.compare_digest(token.encode(), PROFILING_TOKEN.encode())
+
+
+@contextmanager
+def profiling():
+    """Profile everything the current request does inside the block (and in its worker threads)."""
+    profile = Profile()
+    context_token = _active_profile.set(profile)
+    profile.start()
+    try:
+        with profile.thread():
+            yield profile
+    finally:
+        profile.stop()
+        _active_profile.reset(context_token)
+
+
+def store_report(report):
+    """Write the report (JSON, plus the collapsed stacks as .folded) to PROFILING_DIR; returns the JSON file name."""
+    os.makedirs(PROFILING_DIR, exist_ok=True)
+    slug = re.sub(r"[^A-Za-z0-9]+", "-", report["path"]).strip("-") or "root"
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{int(time.time() * 1000) % 1000:03d}-{slug}"
+    with open(os.path.join(PROFILING_DIR, name + ".json"), "w") as f:
+        json.dump(report, f, indent=2)
+    with open(os.path.join(PROFILING_DIR, name + ".folded"), "w") as f:
+        f.write("\n".join(report["collapsed"]) + "\n")
+    return name + ".json"
+
+
+def profiled_endpoint(endpoint):
+    """Wrap a sync endpoint so the worker thread running it is sampled when its request is profiled."""
+    if inspect.iscoroutinefunction(endpoint):
+        # Async endpoints run on the event loop thread, which is already sampled
+        return endpoint
+
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        profile = _active_profile.get()
+        if profile is None:
+            return endpoint(*args, **kwargs)
+        with profile.thread():
+            return endpoint(*args, **kwargs)
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    """Route class that makes endpoints visible to the request profiler."""
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, profiled_endpoint(endpoint) if PROFILING_ENABLED else endpoint, **kwargs)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _active_profile.get() is not None:
+        conn.info.setdefault("profile_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _active_profile.get()
+    if profile is None or not conn.info.get("profile_started"):
+        return
+    elapsed = time.perf_counter() - conn.info["profile_started"].pop()
+    profile.sql.append({
+        "statement": " ".join(statement.split()),
+        "ms": round(elapsed * 1000, 2),
+        "rows": cursor.rowcount,
+    })
+
+
+if PROFILING_ENABLED:
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Batch plan comparison for many member profiles at once.
+
+Reads profiles from a CSV or JSONL file with columns:
+    age, state                              (required)
+    id, metal_level, plan_type, max_premium (optional; plan_type is QHP, SADP or SHOP)
+
+Work runs over worker processes in three stages: one task per state fetches its issuers
+and transparency metrics, one task per (state, age) adds that age's premiums to build the
+plan rows, and the profiles of each (state, age) are ranked against those rows in tasks of
+at most --chunk-size profiles. Each state and each (state, age) is fetched exactly once.
+Results are streamed to the output file (.csv, .jsonl or .parquet) as each ranking task
+finishes, with progress and throughput on stderr.
+
+Usage:
+    python batch_compare.py profiles.csv rankings.csv --top 10 --rank-by value_score --workers 8
+"""
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import be_transparent
+
+PLAN_TYPE_LABELS = {
+    "QHP": "Individual QHP",
+    "SADP": "Individual SADP",
+    "SHOP": "SHOP",
+}
+
+OUTPUT_FIELDS = [
+    "profile_id", "age", "state", "rank", "issuer_id", "issuer_name", "plan_type", "plan_id",
+    "metal_level", "premium", "denial_rate", "resubmission_rate", "out_of_network_pct", "value_score",
+]
+
+
+def read_profiles(path):
+    """Read profiles from CSV or JSONL, assigning sequential ids where none are given."""
+    with open(path, newline="") as f:
+        if path.endswith(".jsonl"):
+            records = [json.loads(line) for line in f if line.strip()]
+        else:
+            records = list(csv.DictReader(f))
+
+    profiles = []
+    for index, record in enumerate(records):
+        max_premium = record.get("max_premium")
+        profiles.append({
+            "id": record.get("id") or str(index + 1),
+            "age": int(record["age"]),
+            "state": str(record["state"]).strip().upper(),
+            "metal_level": record.get("metal_level") or None,
+            "plan_type": (record.get("plan_type") or "").upper() or None,
+            "max_premium": float(max_premium) if max_premium not in (None, "") else None,
+        })
+    return profiles
+
+
+def rank_key(rank_by):
+    """Sort key for plan rows; plans missing the value sort last."""
+    def key(plan):
+        value = be_transparent.value_score(plan) if rank_by == "value_score" else plan[rank_by]
+        return (value is None, value if value is not None else 0)
+    return key
+
+
+def matches(plan, profile):
+    if profile["metal_level"] and (plan["metal_level"] or "").lower() != profile["metal_level"].lower():
+        return False
+    if profile["plan_type"] and plan["plan_type"] != PLAN_TYPE_LABELS.get(profile["plan_type"], profile["plan_type"]):
+        return False
+    if profile["max_premium"] is not None and (plan["premium"] is None or plan["premium"] > profile["max_premium"]):
+        return False
+    return True
+
+
+def fetch_state(state):
+    """
+    Worker: issuers and transparency metrics for one state (None when it has no issuers).
+    The client helpers print diagnostics for interactive use; they are silenced here.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        issuers = be_transparent.get_issuers(state)
+        if not issuers or "error" in issuers:
+            return None
+        return be_transparent.check_all_issuers_transparency(issuers)
+
+
+def fetch_plans(state, age, transparency_results):
+    """Worker: plan rows (transparency metrics plus premiums) for one state and age."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        rates_data = be_transparent.get_rates_data(state, age)
+        return be_transparent.collect_plan_rows(transparency_results, rates_data, age)
+
+
+def rank_group(state, plans, profiles, top, rank_by):
+    """Worker: rank the plan rows of one state and age for every profile in the chunk."""
+    output = []
+    key = rank_key(rank_by)
+    for profile in profiles:
+        candidates = sorted((p for p in plans if matches(p, profile)), key=key)
+        for rank, plan in enumerate(candidates[:top], start=1):
+            output.append({
+                "profile_id": profile["id"],
+                "age": profile["age"],
+                "state": state,
+                "rank": rank,
+                "issuer_id": plan["issuer_id"],
+                "issuer_name": plan["issuer_name"],
+                "plan_type": plan["plan_type"],
+                "plan_id": plan["plan_id"],
+                "metal_level": plan["metal_level"],
+                "premium": plan["premium"],
+                "denial_rate": plan["denial_rate"],
+                "resubmission_rate": plan["resubmission_rate"],
+                "out_of_network_pct": plan["out_of_network_pct"],
+                "value_score": be_transparent.value_score(plan),
+            })
+    return state, len(profiles), output
+
+
+class ResultWriter:
+    """Streams result rows to CSV, JSONL or Parquet based on the file extension."""
+
+    def __init__(self, path):
+        self.path = path
+        self.format = os.path.splitext(path)[1].lstrip(".").lower()
+        self._parquet = None
+        if self.format == "parquet":
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError:
+                sys.exit("Parquet output requires pyarrow: pip install pyarrow")
+            self._pa = pa
+            self._schema = pa.schema([
+                (field, pa.int64() if field in ("age", "rank") else
+                 pa.float64() if field in ("premium", "denial_rate", "resubmission_rate",
+                                           "out_of_network_pct", "value_score") else pa.string())
+                for field in OUTPUT_FIELDS
+            ])
+            self._string_fields = {field.name for field in self._schema if field.type == pa.string()}
+            self._parquet = pq.ParquetWriter(path, self._schema)
+        elif self.format in ("csv", "jsonl"):
+            self._file = open(path, "w", newline="")
+            if self.format == "csv":
+                self._csv = csv.DictWriter(self._file, fieldnames=OUTPUT_FIELDS)
+                self._csv.writeheader()
+        else:
+            sys.exit(f"Unsupported output format '{self.format}' (use .csv, .jsonl or .parquet)")
+
+    def write(self, rows):
+        if not rows:
+            return
+        if self.format == "parquet":
+            columns = {}
+            for field in OUTPUT_FIELDS:
+                values = [row[field] for row in rows]
+                if field in self._string_fields:
+                    values = [None if value is None else str(value) for value in values]
+                columns[field] = values
+            self._parquet.write_table(self._pa.table(columns, schema=self._schema))
+        elif self.format == "csv":
+            self._csv.writerows(rows)
+        else:
+            for row in rows:
+                self._file.write(json.dumps(row) + "\n")
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+        else:
+            self._file.close()
+
+
+def group_profiles(profiles):
+    """Profiles grouped as {state: {age: [profiles]}}."""
+    groups = defaultdict(lambda: defaultdict(list))
+    for profile in profiles:
+        groups[profile["state"]][profile["age"]].append(profile)
+    return groups
+
+
+def chunks(group, chunk_size):
+    return [group[i:i + chunk_size] for i in range(0, len(group), chunk_size)]
+
+
+def run_batch(profiles, output_path, top=10, rank_by="value_score", workers=None, chunk_size=500):
+    groups = group_profiles(profiles)
+    total_tasks = sum(len(chunks(group, chunk_size)) for ages in groups.values() for group in ages.values())
+    print(f"Ranking {len(profiles)} profiles across {len(groups)} states in {total_tasks} tasks...",
+          file=sys.stderr)
+    start = time.time()
+    done_profiles = 0
+    done_tasks = 0
+    rows_written = 0
+
+    def progress(state):
+        elapsed = time.time() - start
+        print(f"[{done_tasks}/{total_tasks} tasks] {state}: {done_profiles}/{len(profiles)} profiles, "
+              f"{done_profiles / elapsed:.1f} profiles/s", file=sys.stderr)
+
+    writer = ResultWriter(output_path)
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # future -> (stage, state, age); each finished stage submits the next one's tasks.
+            # States with the most profiles first so the long ones don't start last.
+            pending = {pool.submit(fetch_state, state): ("state", state, None)
+                       for state in sorted(groups, key=lambda state: -sum(map(len, groups[state].values())))}
+            while pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    stage, state, age = pending.pop(future)
+                    if stage == "state":
+                        transparency_results = future.result()
+                        if transparency_results is None:
+                            # No issuers: every profile in the state is done with no rows
+                            for group in groups[state].values():
+                                done_tasks += len(chunks(group, chunk_size))
+                                done_profiles += len(group)
+                            progress(state)
+                            continue
+                        for age in sorted(groups[state], key=lambda age: -len(groups[state][age])):
+                            pending[pool.submit(fetch_plans, state, age, transparency_results)] = ("plans", state, age)
+                    elif stage == "plans":
+                        plans = future.result()
+                        for chunk in chunks(groups[state][age], chunk_size):
+                            pending[pool.submit(rank_group, state, plans, chunk, top, rank_by)] = ("rank", state, age)
+                    else:
+                        state, count, rows = future.result()
+                        writer.write(rows)
+                        done_tasks += 1
+                        done_profiles += count
+                        rows_written += len(rows)
+                        progress(state)
+    finally:
+        writer.close()
+
+    elapsed = time.time() - start
+    print(f"Wrote {rows_written} rows to {output_path} in {elapsed:.1f}s "
+          f"({len(profiles) / elapsed if elapsed else 0:.1f} profiles/s).", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rank plans for many member profiles.")
+    parser.add_argument("input", help="profiles as .csv or .jsonl")
+    parser.add_argument("output", help="results as .csv, .jsonl or .parquet")
+    parser.add_argument("--top", type=int, default=10, help="plans to keep per profile")
+    parser.add_argument("--rank-by", default="value_score",
+                        choices=["value_score", "denial_rate", "resubmission_rate", "premium"])
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=500,
+                        help="most profiles per ranking task; tasks also never mix states or ages")
+    args = parser.parse_args()
+
+    if not be_transparent.check_api_status():
+        sys.exit(f"Error: Cannot connect to the API. Make sure it's running at {be_transparent.API_BASE_URL}")
+
+    run_batch(read_profiles(args.input), args.output, top=args.top, rank_by=args.rank_by, workers=args.workers,
+              chunk_size=args.chunk_size)
@@ -1,11 +1,36 @@
 #!/usr/bin/env python3
+import argparse
+import os
 import requests
 import json
 from tabulate import tabulate
 
+from http_cache import DEFAULT_CACHE_PATH, HttpCache
+
 # API base URL - assuming the API is running locally on default port
 API_BASE_URL = "http://localhost:8000"
 
+# Persistent response cache settings (CMS_HTTP_CACHE=off disables the cache)
+HTTP_CACHE_PATH = os.getenv("CMS_HTTP_CACHE", DEFAULT_CACHE_PATH)
+HTTP_CACHE_MAX_MB = int(os.getenv("CMS_HTTP_CACHE_MAX_MB", "100"))
+OFFLINE = os.getenv("CMS_OFFLINE") == "1"
+
+_http_cache = None
+
+def get_http_cache():
+    """Open the persistent response cache on first use; None when disabled."""
+    global _http_cache
+    if _http_cache is None and HTTP_CACHE_PATH != "off":
+        _http_cache = HttpCache(HTTP_CACHE_PATH, max_bytes=HTTP_CACHE_MAX_MB * 1024 * 1024, offline=OFFLINE)
+    return _http_cache
+
+def http_get(url):
+    """GET an API URL, going through the persistent cache when it is enabled."""
+    cache = get_http_cache()
+    if cache is None:
+        return requests.get(url)
+    return cache.get(url)
+
 def get_user_input():
     """Get user age and state information."""
     # Get user's age
@@ -33,6 +58,9 @@ def get_user_input():
 
 def check_api_status():
     """Check if the API is running."""
+    if OFFLINE:
+        # Offline mode answers from the cache only
+        return True
     try:
         response = requests.get(f"{API_BASE_URL}/")
         if response.status_code == 200:
@@ -45,7 +73,7 @@ def get_issuers(state_code):
     """Fetch issuer IDs for a given state."""
     try:
         print(f"Fetching issuers for state: {state_code}...")
-        response = requests.get(f"{API_BASE_URL}/issuers/{state_code}")
+        response = http_get(f"{API_BASE_URL}/issuers/{state_code}")
         
         if response.status_code == 200:
             return response.json()
@@ -60,7 +88,7 @@ def get_issuers(state_code):
 def get_all_transparency_data(issuer_id):
     """Fetch transparency data from all tables for a given issuer ID."""
     try:
-        response = requests.get(f"{API_BASE_URL}/all-transparency/{issuer_id}")
+        response = http_get(f"{API_BASE_URL}/all-transparency/{issuer_id}")
         
         if response.status_code == 200:
             return response.json()
@@ -73,7 +101,7 @@ def get_rates_data(state_code, age):
     """Fetch rates data for a specific state and age."""
     try:
         print(f"Fetching premium rates for state: {state_code}, age: {age}...")
-        response = requests.get(f"{API_BASE_URL}/rates/{state_code}/{age}")
+        response = http_get(f"{API_BASE_URL}/rates/{state_code}/{age}")
         
         if response.status_code == 200:
             data = response.json()
@@ -100,7 +128,7 @@ def get_rate_by_plan_id(plan_id, age):
     """Fetch rate data specifically for a plan ID and age."""
     try:
         print(f"Fetching premium rate for plan ID: {plan_id}, age: {age}...")
-        response = requests.get(f"{API_BASE_URL}/rate-by-plan/{plan_id}/{age}")
+        response = http_get(f"{API_BASE_URL}/rate-by-plan/{plan_id}/{age}")
         
         if response.status_code == 200:
             data = response.json()
@@ -140,8 +168,9 @@ def check_all_issuers_transparency(issuers):
         if data and "error" not in data:
             # Store issuer and what data types are available
             available_types = []
-            for data_type in ["indqhp", "ind_sadp", "shop"]:
-                if data_type in data and data[data_type]:
+            # indqhp, ind_sadp, shop, plus any market added to the data later
+            for data_type in data:
+                if isinstance(data[data_type], list) and data[data_type]:
                     available_types.append(data_type)
             
             if available_types:
@@ -173,7 +202,7 @@ def calculate_issuer_metrics(data, available_types):
             if (is_numeric(record.get("Issuer_Claims_Received_In_Network")) and
                 is_numeric(record.get("Issuer_Claims_Received_Out_of_Network")) and
                 is_numeric(record.get("Issuer_Claims_Denied_In_Network")) and
-                is_numeric(record.get("Issuer_Claims_Denied_Out_of_Network\"")) and
+                is_numeric(get_denied_out_of_network(record)) and
                 is_numeric(record.get("Issuer_Claims_Resubmitted_In_Network")) and
                 is_numeric(record.get("Issuer_Claims_Resubmitted_Out_of_Network"))):
                 complete_issuer_record = record
@@ -185,7 +214,7 @@ def calculate_issuer_metrics(data, available_types):
             claims_in_net = float(complete_issuer_record.get("Issuer_Claims_Received_In_Network", 0))
             claims_out_net = float(complete_issuer_record.get("Issuer_Claims_Received_Out_of_Network", 0))
             denied_in_net = float(get_numeric_value(complete_issuer_record.get("Issuer_Claims_Denied_In_Network", 0)))
-            denied_out_net = float(get_numeric_value(complete_issuer_record.get("Issuer_Claims_Denied_Out_of_Network\"", 0)))
+            denied_out_net = float(get_numeric_value(get_denied_out_of_network(complete_issuer_record) or 0))
             resub_in_net = float(get_numeric_value(complete_issuer_record.get("Issuer_Claims_Resubmitted_In_Network", 0)))
             resub_out_net = float(get_numeric_value(complete_issuer_record.get("Issuer_Claims_Resubmitted_Out_of_Network", 0)))
             
@@ -244,6 +273,12 @@ def calculate_issuer_metrics(data, available_types):
     
     return metrics
 
+def get_denied_out_of_network(record):
+    """The raw CMS files name this column with a stray trailing quote; the API now normalizes it."""
+    if "Issuer_Claims_Denied_Out_of_Network" in record:
+        return record["Issuer_Claims_Denied_Out_of_Network"]
+    return record.get("Issuer_Claims_Denied_Out_of_Network\"")
+
 def is_numeric(value):
     """Check if a value can be converted to a number."""
     if value is None:
@@ -308,13 +343,13 @@ def process_rates_data(rates_data):
     
     return plan_id_to_premium
 
-def display_metrics_for_all_plans(results, rates_data, user_age):
-    """Display calculated metrics for all plans in a concise table."""
-    if not results:
-        print("\nNo transparency data found for any issuers.")
-        return
-    
-    all_plans = []
+def collect_plan_rows(results, rates_data, user_age):
+    """
+    Combine transparency metrics with premiums into one row per plan.
+    Values stay numeric (premium is None when unknown) so callers can sort and rank
+    without reparsing display strings.
+    """
+    plan_rows = []
     
     # Process rates data for faster lookup
     plan_id_to_premium = process_rates_data(rates_data)
@@ -364,18 +399,16 @@ def display_metrics_for_all_plans(results, rates_data, user_age):
                         # Add to our cache for faster lookups
                         plan_id_to_premium[plan_id] = premium
                 
-                premium_display = f"${premium:.2f}" if premium else "N/A"
-                
-                all_plans.append({
-                    "Issuer ID": issuer_id,
-                    "Issuer Name": issuer_name,
-                    "Plan Type": data_type_label,
-                    "Plan ID": plan_id,
-                    "Metal Level": plan["Metal_Level"],
-                    "Monthly Premium": premium_display,
-                    "Denial Rate": f"{plan['denial_rate']:.2%}",
-                    "Resubmission Rate": f"{plan['resubmission_rate']:.2%}",
-                    "Out-of-Network %": f"{plan['out_of_network_claims_pct']:.2%}"
+                plan_rows.append({
+                    "issuer_id": issuer_id,
+                    "issuer_name": issuer_name,
+                    "plan_type": data_type_label,
+                    "plan_id": plan_id,
+                    "metal_level": plan["Metal_Level"],
+                    "premium": float(premium) if premium else None,
+                    "denial_rate": plan["denial_rate"],
+                    "resubmission_rate": plan["resubmission_rate"],
+                    "out_of_network_pct": plan["out_of_network_claims_pct"],
                 })
     
     # Print sample plan IDs from transparency data for debugging
@@ -386,41 +419,58 @@ def display_metrics_for_all_plans(results, rates_data, user_age):
     if api_requests_count > 0:
         print(f"\nMade {api_requests_count} direct API requests for plan premium data, successful: {api_success_count} ({(api_success_count/api_requests_count)*100:.1f}%)")
     
+    return plan_rows
+
+def value_score(plan):
+    """Premium divided by probability of claim approval (cost per approved claim); lower is better."""
+    if plan["premium"] is None:
+        return None
+    return plan["premium"] / (1 - plan["denial_rate"]) if plan["denial_rate"] < 1 else float('inf')
+
+def format_plan_row(plan, include_value_score=False):
+    """Format a numeric plan row for tabulate."""
+    row = {
+        "Issuer ID": plan["issuer_id"],
+        "Issuer Name": plan["issuer_name"],
+        "Plan Type": plan["plan_type"],
+        "Plan ID": plan["plan_id"],
+        "Metal Level": plan["metal_level"],
+        "Monthly Premium": f"${plan['premium']:.2f}" if plan["premium"] else "N/A",
+        "Denial Rate": f"{plan['denial_rate']:.2%}",
+        "Resubmission Rate": f"{plan['resubmission_rate']:.2%}",
+        "Out-of-Network %": f"{plan['out_of_network_pct']:.2%}"
+    }
+    if include_value_score:
+        row["Value Score"] = f"${value_score(plan):.2f}"
+    return row
+
+def display_metrics_for_all_plans(results, rates_data, user_age):
+    """Display calculated metrics for all plans in a concise table."""
+    if not results:
+        print("\nNo transparency data found for any issuers.")
+        return
+    
+    all_plans = collect_plan_rows(results, rates_data, user_age)
+    
     if all_plans:
         # Count plans with premium data
-        plans_with_premium_count = sum(1 for p in all_plans if p["Monthly Premium"] != "N/A")
-        print(f"\nFound premium data for {plans_with_premium_count} out of {len(all_plans)} plans.")
+        plans_with_premium = [p for p in all_plans if p["premium"]]
+        print(f"\nFound premium data for {len(plans_with_premium)} out of {len(all_plans)} plans.")
         
         print("\nAll Available Plans With Quality Metrics:")
-        print(tabulate(all_plans, headers="keys", tablefmt="grid"))
+        print(tabulate([format_plan_row(p) for p in all_plans], headers="keys", tablefmt="grid"))
         
         # Sort plans by denial rate (lowest to highest)
         print("\nPlans Ranked by Denial Rate (Lowest to Highest):")
-        sorted_by_denial = sorted(
-            all_plans, 
-            key=lambda x: float(x["Denial Rate"].strip('%')) / 100
-        )
-        print(tabulate(sorted_by_denial, headers="keys", tablefmt="grid"))
+        sorted_by_denial = sorted(all_plans, key=lambda x: x["denial_rate"])
+        print(tabulate([format_plan_row(p) for p in sorted_by_denial], headers="keys", tablefmt="grid"))
         
         # Sort by value (premium divided by (1 - denial_rate))
         print("\nPlans Ranked by Value (Lower premium + lower denial rate = better value):")
-        # Filter plans with valid premium data first
-        plans_with_premium = [p for p in all_plans if p["Monthly Premium"] != "N/A"]
-        
         if plans_with_premium:
-            for plan in plans_with_premium:
-                premium = float(plan["Monthly Premium"].replace("$", ""))
-                denial_rate = float(plan["Denial Rate"].strip('%')) / 100
-                # Value score: premium divided by probability of claim approval
-                # Lower is better - represents cost per approved claim
-                value_score = premium / (1 - denial_rate) if denial_rate < 1 else float('inf')
-                plan["Value Score"] = f"${value_score:.2f}"
-            
-            sorted_by_value = sorted(
-                plans_with_premium,
-                key=lambda x: float(x["Value Score"].replace("$", ""))
-            )
-            print(tabulate(sorted_by_value, headers="keys", tablefmt="grid"))
+            sorted_by_value = sorted(plans_with_premium, key=value_score)
+            print(tabulate([format_plan_row(p, include_value_score=True) for p in sorted_by_value],
+                           headers="keys", tablefmt="grid"))
         else:
             print("\nNo plans with premium data available for value ranking.")
     else:
@@ -459,6 +509,22 @@ def main():
     
     # Display metrics for all plans in a concise table with premium information
     display_metrics_for_all_plans(transparency_results, rates_data, age)
+    
+    cache = get_http_cache()
+    if cache is not None:
+        print(f"\nResponse cache: {cache.stats['fresh_hits']} fresh hits, "
+              f"{cache.stats['revalidated']} revalidated, {cache.stats['misses']} fetched")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare healthcare plans by premium and quality metrics.")
+    parser.add_argument("--offline", action="store_true", help="use cached API responses only")
+    parser.add_argument("--no-cache", action="store_true", help="bypass the persistent response cache")
+    parser.add_argument("--clear-cache", action="store_true", help="empty the response cache before running")
+    args = parser.parse_args()
+    
+    OFFLINE = OFFLINE or args.offline
+    if args.no_cache:
+        HTTP_CACHE_PATH = "off"
+    if args.clear_cache and get_http_cache() is not None:
+        get_http_cache().clear()
     main()
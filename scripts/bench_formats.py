@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Compare response formats and encodings for the tabular API endpoints.
+
+For each endpoint, format (JSON, MessagePack, Arrow IPC) and content encoding
+(identity, gzip, br) this reports the bytes on the wire and the time to fetch and
+decode the payload into a pandas DataFrame, which is what the batch consumers do.
+
+Usage:
+    python bench_formats.py --state TX --issuer 12345 --iterations 20
+"""
+import argparse
+import gzip
+import io
+import json
+import statistics
+import time
+
+import pandas as pd
+import requests
+from tabulate import tabulate
+
+from be_transparent import API_BASE_URL
+
+FORMATS = {
+    "json": "application/json",
+    "msgpack": "application/msgpack",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+ENCODINGS = ["identity", "gzip", "br"]
+
+
+def decompress(body, encoding):
+    if encoding == "gzip":
+        return gzip.decompress(body)
+    if encoding == "br":
+        import brotli
+        return brotli.decompress(body)
+    return body
+
+
+def decode(body, format_name):
+    if format_name == "json":
+        data = json.loads(body)
+        if isinstance(data, dict):
+            # /all-transparency groups rows by market
+            return pd.concat([pd.DataFrame(rows).assign(data_type=key) for key, rows in data.items()
+                              if isinstance(rows, list)], ignore_index=True)
+        return pd.DataFrame(data)
+    if format_name == "msgpack":
+        import msgpack
+        return pd.DataFrame(msgpack.unpackb(body, raw=False))
+    import pyarrow as pa
+    return pa.ipc.open_stream(io.BytesIO(body)).read_all().to_pandas()
+
+
+def measure(url, format_name, encoding, iterations):
+    headers = {"Accept": FORMATS[format_name], "Accept-Encoding": encoding}
+    wire_sizes, fetch_times, decode_times = [], [], []
+    rows = 0
+    for _ in range(iterations):
+        start = time.perf_counter()
+        response = requests.get(url, headers=headers, stream=True)
+        # Read the raw bytes so the size reflects what went over the wire
+        body = response.raw.read(decode_content=False)
+        fetched = time.perf_counter()
+        if response.status_code != 200:
+            return None
+        df = decode(decompress(body, response.headers.get("content-encoding", "identity")), format_name)
+        decoded = time.perf_counter()
+
+        wire_sizes.append(len(body))
+        fetch_times.append((fetched - start) * 1000)
+        decode_times.append((decoded - fetched) * 1000)
+        rows = len(df)
+    return {
+        "format": format_name,
+        "encoding": encoding,
+        "rows": rows,
+        "wire bytes": wire_sizes[-1],
+        "fetch ms (median)": round(statistics.median(fetch_times), 2),
+        "decode ms (median)": round(statistics.median(decode_times), 2),
+        "total ms (median)": round(statistics.median([f + d for f, d in zip(fetch_times, decode_times)]), 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark API response formats.")
+    parser.add_argument("--state", default="TX")
+    parser.add_argument("--age", type=int, default=40)
+    parser.add_argument("--issuer", required=True, help="issuer ID for the transparency endpoints")
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    endpoints = [
+        f"/plans/{args.state}",
+        f"/rates/{args.state}/{args.age}",
+        f"/all-transparency/{args.issuer}",
+    ]
+    for endpoint in endpoints:
+        results = []
+        for format_name in FORMATS:
+            for encoding in ENCODINGS:
+                result = measure(API_BASE_URL + endpoint, format_name, encoding, args.iterations)
+                if result is None:
+                    print(f"Skipping {format_name}/{encoding} for {endpoint}: not available on the server")
+                    continue
+                results.append(result)
+        print(f"\n{endpoint}")
+        print(tabulate(results, headers="keys", tablefmt="grid"))
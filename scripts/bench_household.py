@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Benchmark household premium pricing (api/household.py) for one state.
+
+Reads the state's rate rows once, builds the plan x age RateMatrix, then prices random
+households (1-6 members, some tobacco users) three ways and reports households per second:
+    loop     per-member dictionary lookups for every plan, as a plain Python baseline
+    single   RateMatrix.price, one household at a time
+    batch    RateMatrix.price_batch, --batch-size households per matrix product
+
+Usage:
+    python bench_household.py --state TX --households 10000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, text
+
+from load_data_pgs import DATABASE_URL
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'api'))
+from household import RateMatrix, family_tier, member_counts  # noqa: E402
+
+load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))
+
+# Same statement as api/main.py state_rate_matrix
+RATES_QUERY = text('''
+    SELECT "PlanId", "RatingAreaId", "RateEffectiveDate", "AgeMin", "AgeMax",
+           "IndividualRate", "IndividualTobaccoRate", "Couple",
+           "PrimarySubscriberAndOneDependent", "PrimarySubscriberAndTwoDependents",
+           "PrimarySubscriberAndThreeOrMoreDependents", "CoupleAndOneDependent",
+           "CoupleAndTwoDependents", "CoupleAndThreeOrMoreDependents"
+    FROM rate_puf
+    WHERE "StateCode" = :state;
+''')
+
+
+def random_household():
+    adults = [random.randint(21, 64) for _ in range(random.choice([1, 1, 2, 2, 2]))]
+    children = [random.randint(0, 20) for _ in range(random.choice([0, 0, 1, 2, 3, 4]))]
+    ages = adults + children
+    tobacco = [age >= 21 and random.random() < 0.15 for age in ages]
+    return ages, tobacco
+
+
+def price_loop(matrix, households):
+    """Plain Python reference: look up every charged member's rate (or the family tier rate) for every plan row."""
+    rates = {}
+    for row in range(len(matrix)):
+        for age in range(matrix.standard.shape[1]):
+            rates[row, age, False] = matrix.standard[row, age]
+            rates[row, age, True] = matrix.tobacco[row, age]
+    family_rated = (matrix.plans["rating"] == "family_tier").tolist()
+    results = []
+    for household in households:
+        standard_counts, tobacco_counts = member_counts([household])
+        members = [(age, False, count) for age, count in enumerate(standard_counts[0]) if count]
+        members += [(age, True, count) for age, count in enumerate(tobacco_counts[0]) if count]
+        results.append([matrix.family[row, family_tier(household[0])] if family_rated[row]
+                        else sum(rates[row, age, smoker] * count for age, smoker, count in members)
+                        for row in range(len(matrix))])
+    return results
+
+
+def rate(label, count, seconds):
+    print(f"{label:<8} {count:>8} households in {seconds:7.3f}s   {count / seconds:12,.0f} households/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the household premium engine.")
+    parser.add_argument("--state", default="TX")
+    parser.add_argument("--households", type=int, default=10000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--loop-households", type=int, default=200,
+                        help="households for the slow Python baseline")
+    args = parser.parse_args()
+
+    engine = create_engine(os.getenv("DATABASE_URL", DATABASE_URL))
+    start = time.perf_counter()
+    rates = pd.read_sql_query(RATES_QUERY, engine, params={"state": args.state.upper()})
+    fetched = time.perf_counter()
+    matrix = RateMatrix(rates)
+    built = time.perf_counter()
+    engine.dispose()
+    if len(matrix) == 0:
+        sys.exit(f"No rate data found for state {args.state.upper()}.")
+    print(f"{len(rates)} rate rows fetched in {fetched - start:.2f}s; "
+          f"{len(matrix)} plan rows x {matrix.standard.shape[1]} ages built in {built - fetched:.3f}s\n")
+
+    households = [random_household() for _ in range(args.households)]
+
+    sample = households[:args.loop_households]
+    start = time.perf_counter()
+    expected = price_loop(matrix, sample)
+    rate("loop", len(sample), time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for ages, tobacco in households:
+        matrix.price(ages, tobacco)
+    rate("single", len(households), time.perf_counter() - start)
+
+    start = time.perf_counter()
+    batched = [matrix.price_batch(households[i:i + args.batch_size])
+               for i in range(0, len(households), args.batch_size)]
+    rate("batch", len(households), time.perf_counter() - start)
+
+    # The vectorized results must match the reference
+    assert np.allclose(np.vstack(batched)[:len(sample)], np.array(expected), equal_nan=True)
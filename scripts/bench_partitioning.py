@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Benchmark the /rates/{state}/{age} query against a state-partitioned and an unpartitioned
+copy of rate_puf.
+
+Both copies are built from the live rate_puf, optionally replicated --scale times to
+simulate a larger dataset, with the same indexes. Each layout then runs the exact query
+used by the API for a sample of states and ages.
+
+Usage:
+    python bench_partitioning.py --scale 10 --iterations 200
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, text
+
+from load_data_pgs import DATABASE_URL, partition_name
+
+load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))
+
+FLAT_TABLE = "bench_rate_flat"
+PARTITIONED_TABLE = "bench_rate_partitioned"
+
+# Same statement as api/main.py get_rates
+RATES_QUERY = '''
+    SELECT * FROM {table}
+    WHERE "StateCode" = :state
+    AND "AgeMin" <= :age AND "AgeMax" >= :age
+    LIMIT 20;
+'''
+
+
+def build_tables(engine, scale):
+    with engine.begin() as conn:
+        states = [row[0] for row in conn.execute(text(
+            'SELECT DISTINCT "StateCode" FROM rate_puf WHERE "StateCode" IS NOT NULL ORDER BY 1'))]
+        for table in (FLAT_TABLE, PARTITIONED_TABLE):
+            conn.execute(text(f'DROP TABLE IF EXISTS "{table}" CASCADE'))
+
+        print(f"Building {FLAT_TABLE} (rate_puf x {scale})...")
+        conn.execute(text(f'''
+            CREATE TABLE "{FLAT_TABLE}" AS
+            SELECT rate_puf.* FROM rate_puf CROSS JOIN generate_series(1, :scale);
+        '''), {"scale": scale})
+
+        print(f"Building {PARTITIONED_TABLE} with {len(states)} state partitions...")
+        conn.execute(text(f'''
+            CREATE TABLE "{PARTITIONED_TABLE}" (LIKE "{FLAT_TABLE}")
+            PARTITION BY LIST ("StateCode");
+        '''))
+        for state in states:
+            conn.execute(text(
+                f'CREATE TABLE "{partition_name(PARTITIONED_TABLE, state)}" '
+                f'PARTITION OF "{PARTITIONED_TABLE}" FOR VALUES IN (\'{state}\')'
+            ))
+        conn.execute(text(
+            f'CREATE TABLE "{partition_name(PARTITIONED_TABLE, "default")}" PARTITION OF "{PARTITIONED_TABLE}" DEFAULT'
+        ))
+        conn.execute(text(f'INSERT INTO "{PARTITIONED_TABLE}" SELECT * FROM "{FLAT_TABLE}"'))
+
+        for table in (FLAT_TABLE, PARTITIONED_TABLE):
+            conn.execute(text(f'CREATE INDEX ON "{table}" ("StateCode", "AgeMin", "AgeMax")'))
+            conn.execute(text(f'ANALYZE "{table}"'))
+        count = conn.execute(text(f'SELECT COUNT(*) FROM "{FLAT_TABLE}"')).scalar()
+    print(f"Each layout holds {count} rows.")
+    return states
+
+
+def run_queries(engine, table, samples):
+    timings = []
+    query = text(RATES_QUERY.format(table=f'"{table}"'))
+    with engine.connect() as conn:
+        for state, age in samples:
+            start = time.perf_counter()
+            conn.execute(query, {"state": state, "age": age}).fetchall()
+            timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def report(label, timings):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{label:<14} mean {statistics.mean(timings):7.2f} ms   "
+          f"p50 {statistics.median(timings):7.2f} ms   p95 {p95:7.2f} ms")
+
+
+def show_plan(engine, table, state):
+    with engine.connect() as conn:
+        plan = conn.execute(text("EXPLAIN " + RATES_QUERY.format(table=f'"{table}"')),
+                            {"state": state, "age": 40})
+        print(f"\nPlan for {table}:")
+        for row in plan:
+            print("   ", row[0])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark partitioned vs unpartitioned rate_puf.")
+    parser.add_argument("--scale", type=int, default=1, help="replicate rate_puf this many times")
+    parser.add_argument("--iterations", type=int, default=200, help="queries per layout")
+    parser.add_argument("--keep", action="store_true", help="keep the benchmark tables afterwards")
+    args = parser.parse_args()
+
+    engine = create_engine(os.getenv("DATABASE_URL", DATABASE_URL))
+    try:
+        states = build_tables(engine, args.scale)
+        samples = [(random.choice(states), random.randint(21, 64)) for _ in range(args.iterations)]
+
+        # Warm both layouts so the comparison isn't dominated by cold cache reads
+        run_queries(engine, FLAT_TABLE, samples[:20])
+        run_queries(engine, PARTITIONED_TABLE, samples[:20])
+
+        print(f"\n/rates query, {args.iterations} iterations:")
+        report("unpartitioned", run_queries(engine, FLAT_TABLE, samples))
+        report("partitioned", run_queries(engine, PARTITIONED_TABLE, samples))
+
+        show_plan(engine, FLAT_TABLE, states[0])
+        show_plan(engine, PARTITIONED_TABLE, states[0])
+    finally:
+        if not args.keep:
+            with engine.begin() as conn:
+                for table in (FLAT_TABLE, PARTITIONED_TABLE):
+                    conn.execute(text(f'DROP TABLE IF EXISTS "{table}" CASCADE'))
+        engine.dispose()
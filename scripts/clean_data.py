@@ -0,0 +1,80 @@
+"""
+Typed cleaning applied to every CMS CSV before it is loaded.
+
+- Column headers are trimmed and stripped of stray quotes
+  (e.g. 'Issuer_Claims_Denied_Out_of_Network"').
+- Claim-count columns of the transparency files (Issuer_Claims_* / Plan_Number_Claims_*:
+  "1,234", or "**" when CMS suppresses small counts) become integer columns. Suppressed cells are stored as NULL with a matching <column>_Suppressed
+  boolean, so SQL can sum, filter and sort them numerically.
+- Rate ages ("0-14", "40", "64 and over", "Family Option") get integer AgeMin/AgeMax
+  bounds next to the original Age text, so age lookups are numeric range filters.
+"""
+import re
+
+import pandas as pd
+
+SUPPRESSED_MARKER = "**"
+SUPPRESSED_SUFFIX = "_Suppressed"
+
+# Count columns of the transparency PUFs, e.g. Plan_Number_Claims_Denied_Out_of_Network.
+# Matched by name so text columns such as URL_Claims_Payment_Policies stay text.
+CLAIM_COUNT_COLUMN = re.compile(r'^(Issuer_Claims|Plan_Number_Claims)_(Received|Denied|Resubmitted)(_\w+)?$')
+
+# Upper bound stored for the open-ended "64 and over" band
+AGE_OPEN_MAX = 120
+
+
+def normalize_column(name):
+    """Canonical header: trimmed, without stray quotes."""
+    return str(name).strip().strip('"\'').strip()
+
+
+def is_claim_count_column(name):
+    return bool(CLAIM_COUNT_COLUMN.match(name)) and not name.endswith(SUPPRESSED_SUFFIX)
+
+
+def parse_counts(series):
+    """Return (nullable integer counts, suppressed flags) for a claim-count column."""
+    if pd.api.types.is_numeric_dtype(series):
+        return series.round().astype("Int64"), pd.Series(False, index=series.index)
+    text = series.astype("string").str.strip()
+    suppressed = (text == SUPPRESSED_MARKER).fillna(False).astype(bool)
+    values = pd.to_numeric(text.str.replace(",", "", regex=False), errors="coerce")
+    return values.round().astype("Int64"), suppressed
+
+
+def parse_age_bounds(series):
+    """Return (AgeMin, AgeMax) integer bounds for rate_puf-style age labels; NULL when not an age."""
+    text = series.astype("string").str.strip().str.lower()
+    age_range = text.str.extract(r'^(\d+)\s*-\s*(\d+)$')
+    and_over = text.str.extract(r'^(\d+)\s*and over$')[0]
+    single = text.str.extract(r'^(\d+)(?:\.0+)?$')[0]
+
+    age_min = pd.to_numeric(age_range[0]).fillna(pd.to_numeric(and_over)).fillna(pd.to_numeric(single))
+    open_ended = pd.Series(AGE_OPEN_MAX, index=series.index).where(and_over.notna())
+    age_max = pd.to_numeric(age_range[1]).fillna(open_ended).fillna(pd.to_numeric(single))
+    return age_min.astype("Int64"), age_max.astype("Int64")
+
+
+def clean_dataset(df, claim_counts=False):
+    """
+    Apply the typed-cleaning rules to a freshly read CMS CSV. Pass claim_counts=True for
+    transparency files, the only ones whose claim columns are parsed as counts.
+    """
+    df = df.rename(columns=normalize_column)
+    # Headers that only differed by stray quotes collapse to one column; keep the first
+    df = df.loc[:, ~df.columns.duplicated()]
+
+    for column in [c for c in df.columns if claim_counts and is_claim_count_column(c)]:
+        values, suppressed = parse_counts(df[column])
+        df[column] = values
+        # Always present so every file and refresh has the same schema
+        df[column + SUPPRESSED_SUFFIX] = suppressed
+
+    if "Age" in df.columns and "AgeMin" not in df.columns:
+        age_min, age_max = parse_age_bounds(df["Age"])
+        position = df.columns.get_loc("Age") + 1
+        df.insert(position, "AgeMin", age_min)
+        df.insert(position + 1, "AgeMax", age_max)
+
+    return df
@@ -0,0 +1,144 @@
+"""
+Persistent HTTP cache for the API client, stored in SQLite and keyed by URL.
+
+Responses stay fresh for max_age seconds and are served without touching the network.
+After that they are revalidated with If-None-Match; the API answers 304 Not Modified
+until the data is refreshed, so a repeat lookup costs one small conditional request.
+The cache is capped at max_bytes and evicts the least recently used entries first.
+In offline mode only cached responses are returned.
+"""
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+import requests
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'http_cache.db')
+DEFAULT_MAX_BYTES = 100 * 1024 * 1024
+# CMS data changes a few times a year; skip even the conditional request within this window
+DEFAULT_MAX_AGE = 60 * 60
+
+
+class CachedResponse:
+    """The parts of requests.Response that the client uses."""
+
+    def __init__(self, status_code, content, from_cache=False):
+        self.status_code = status_code
+        self.content = content
+        self.from_cache = from_cache
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class HttpCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES, max_age=DEFAULT_MAX_AGE,
+                 offline=False, timeout=30):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.offline = offline
+        self.timeout = timeout
+        self.stats = {"fresh_hits": 0, "revalidated": 0, "misses": 0, "stale_on_error": 0}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS responses (
+                    url TEXT PRIMARY KEY,
+                    etag TEXT,
+                    status_code INTEGER NOT NULL,
+                    body BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    stored_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)')
+
+    @contextmanager
+    def _connect(self):
+        # A short-lived connection per call keeps the cache safe to share across worker processes
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _lookup(self, url):
+        with self._connect() as conn:
+            return conn.execute(
+                'SELECT etag, status_code, body, stored_at FROM responses WHERE url = ?', (url,)
+            ).fetchone()
+
+    def _touch(self, url, refreshed=False):
+        now = time.time()
+        with self._connect() as conn:
+            if refreshed:
+                conn.execute('UPDATE responses SET last_used = ?, stored_at = ? WHERE url = ?', (now, now, url))
+            else:
+                conn.execute('UPDATE responses SET last_used = ? WHERE url = ?', (now, url))
+
+    def _store(self, url, etag, status_code, body):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO responses (url, etag, status_code, body, size, stored_at, last_used)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (url, etag, status_code, body, len(body), now, now))
+            self._evict(conn)
+
+    def _evict(self, conn):
+        """Drop least recently used entries until the cache fits in max_bytes."""
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for url, size in conn.execute('SELECT url, size FROM responses ORDER BY last_used').fetchall():
+            conn.execute('DELETE FROM responses WHERE url = ?', (url,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def get(self, url):
+        """GET url through the cache. Raises requests.exceptions.ConnectionError offline on a miss."""
+        cached = self._lookup(url)
+
+        if cached:
+            etag, status_code, body, stored_at = cached
+            if self.offline or time.time() - stored_at < self.max_age:
+                self.stats["fresh_hits"] += 1
+                self._touch(url)
+                return CachedResponse(status_code, body, from_cache=True)
+        elif self.offline:
+            raise requests.exceptions.ConnectionError(f"Offline mode: {url} is not cached")
+
+        headers = {"If-None-Match": cached[0]} if cached and cached[0] else {}
+        try:
+            response = requests.get(url, headers=headers, timeout=self.timeout)
+        except requests.exceptions.RequestException:
+            if cached:
+                # Serve stale data rather than fail when the API is unreachable
+                self.stats["stale_on_error"] += 1
+                return CachedResponse(cached[1], cached[2], from_cache=True)
+            raise
+
+        if response.status_code == 304 and cached:
+            self.stats["revalidated"] += 1
+            self._touch(url, refreshed=True)
+            return CachedResponse(cached[1], cached[2], from_cache=True)
+
+        self.stats["misses"] += 1
+        # Only cache responses the API marked as cacheable (errors carry no ETag)
+        if response.status_code == 200 and response.headers.get("ETag"):
+            self._store(url, response.headers["ETag"], response.status_code, response.content)
+        return CachedResponse(response.status_code, response.content)
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM responses')
@@ -2,6 +2,8 @@ import sqlite3
 import pandas as pd
 import os
 
+from clean_data import clean_dataset
+
 data_folder = os.path.join(os.path.dirname(__file__), '..', 'data')
 
 # Database connection (creates if doesn't exist)
@@ -30,7 +32,8 @@ datasets = {
 # Load each CSV into a table
 for csv_file, table_name in datasets.items():
     print(f"Loading {csv_file} into {table_name} table...")
-    df = pd.read_csv(os.path.join(data_folder, csv_file), low_memory=False)
+    df = clean_dataset(pd.read_csv(os.path.join(data_folder, csv_file), low_memory=False),
+                       claim_counts=csv_file.lower().startswith("transparency"))
     df.to_sql(table_name, conn, if_exists="replace", index=False)
 
 # Verify by printing table names
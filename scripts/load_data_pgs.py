@@ -1,6 +1,11 @@
+import hashlib
 import os
+import re
+import numpy as np
 import pandas as pd
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
+
+from clean_data import AGE_OPEN_MAX, clean_dataset, normalize_column
 
 # Your local PostgreSQL URL
 DATABASE_URL = 'postgresql://localhost:5432/cms_healthcare_data'
@@ -8,9 +13,6 @@ DATABASE_URL = 'postgresql://localhost:5432/cms_healthcare_data'
 # Path to your CSV files
 data_folder = os.path.join(os.path.dirname(__file__), '..', 'data')
 
-# Create SQLAlchemy engine
-engine = create_engine(DATABASE_URL)
-
 datasets = {
     "benefits-and-cost-sharing-puf.csv": "benefits_and_cost_sharing",
     "business-rules-puf.csv": "business_rules",
@@ -30,12 +32,481 @@ datasets = {
     "NJServiceAreas06262024.csv": "nj_service_areas_06262024",
 }
 
-# Load each CSV into PostgreSQL
-for csv_file, table_name in datasets.items():
-    print(f"Loading {csv_file} into table {table_name}...")
+# Columns the API filters on, indexed every time a table is (re)loaded
+table_indexes = {
+    "plan_attributes_puf": [("StateCode",), ("IssuerId",)],
+    "rate_puf": [("StateCode", "AgeMin", "AgeMax"), ("PlanId", "AgeMin", "AgeMax")],
+    "transparency_in_coverage_puf_indqhp": [("Issuer_ID",)],
+    "transparency_2025_ind_sadp": [("Issuer_ID",)],
+    "transparency_2025_shop": [("Issuer_ID",)],
+    "transparency_fact": [("Issuer_ID", "market", "Plan_ID")],
+    "plan_availability": [("StateCode", "County", "ZipCode")],
+    "benefit_names": [("search_name",)],
+    "benefit_postings": [("benefit_id", "StateCode", "PlanId", "IssuerId")],
+    "plan_quality_metrics": [
+        ("state_code", "denial_rate"),
+        ("state_code", "resubmission_rate"),
+        ("plan_id",),
+    ],
+    # One index per /rankings sort key, so the top-k is read in index order
+    "plan_rankings": [
+        ("state_code", "age", "value_score", "plan_id"),
+        ("state_code", "age", "premium", "plan_id"),
+        ("state_code", "age", "denial_rate", "plan_id"),
+        ("state_code", "age", "resubmission_rate", "plan_id"),
+    ],
+}
+
+# The largest tables are list-partitioned by state so "StateCode" filters prune to a
+# single partition, and one state can be vacuumed or reloaded on its own
+PARTITION_LARGE_TABLES = True
+partitioned_tables = {
+    "rate_puf": "StateCode",
+    "benefits_and_cost_sharing": "StateCode",
+}
+
+
+# Transparency tables and the market (plan type) their rows describe
+transparency_markets = {
+    "transparency_in_coverage_puf_indqhp": "QHP",
+    "transparency_2025_ind_sadp": "SADP",
+    "transparency_2025_shop": "SHOP",
+}
+
+
+def infer_market(file_name):
+    """Guess the market of a transparency file from its name, e.g. Transparency-2026-Ind-SADP.csv -> SADP."""
+    lowered = file_name.lower()
+    for token, market in (("sadp", "SADP"), ("shop", "SHOP"), ("qhp", "QHP")):
+        if token in lowered:
+            return market
+    return re.sub(r'[^A-Z0-9]+', '_', os.path.splitext(file_name)[0].upper()).strip('_')
+
+
+def plan_year(name):
+    """Plan year in a transparency file or table name (transparency_2025_shop -> 2025), or None."""
+    match = re.search(r'(?<!\d)(20\d\d)(?!\d)', name)
+    return int(match.group(1)) if match else None
+
+
+def discover_transparency_datasets():
+    """
+    Register transparency CSVs in the data folder that aren't listed in datasets, so a
+    new market or year only needs its file dropped into data/ to reach transparency_fact.
+    """
+    if not os.path.isdir(data_folder):
+        return
+    for csv_file in sorted(os.listdir(data_folder)):
+        if csv_file in datasets or not csv_file.lower().startswith("transparency") \
+                or not csv_file.lower().endswith(".csv"):
+            continue
+        table_name = re.sub(r'[^a-z0-9]+', '_', os.path.splitext(csv_file)[0].lower()).strip('_')
+        datasets[csv_file] = table_name
+        transparency_markets[table_name] = infer_market(csv_file)
+        table_indexes.setdefault(table_name, [("Issuer_ID",)])
+
+
+discover_transparency_datasets()
+
+
+# Bookkeeping shared by the full load, refresh_data.py and reload_state.py. The API
+# includes the data version in its ETags and caches, so every load must bump it.
+FINGERPRINT_TABLE = "data_file_fingerprints"
+VERSION_TABLE = "data_version"
+
+
+def fingerprint(path, chunk_size=1 << 20):
+    """Return a "<size>:<sha256>" fingerprint for a file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return f"{os.path.getsize(path)}:{digest.hexdigest()}"
+
+
+def ensure_metadata_tables(engine):
+    """Create the fingerprint and data-version bookkeeping tables if needed."""
+    with engine.begin() as conn:
+        conn.execute(text(f'''
+            CREATE TABLE IF NOT EXISTS {FINGERPRINT_TABLE} (
+                source_file TEXT PRIMARY KEY,
+                table_name TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                loaded_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            );
+        '''))
+        conn.execute(text(f'''
+            CREATE TABLE IF NOT EXISTS {VERSION_TABLE} (
+                id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+                version BIGINT NOT NULL,
+                refreshed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            );
+        '''))
+        conn.execute(text(f'''
+            INSERT INTO {VERSION_TABLE} (id, version) VALUES (TRUE, 0)
+            ON CONFLICT (id) DO NOTHING;
+        '''))
+
+
+def record_fingerprint(conn, csv_file, table_name, file_fingerprint):
+    conn.execute(text(f'''
+        INSERT INTO {FINGERPRINT_TABLE} (source_file, table_name, fingerprint, loaded_at)
+        VALUES (:source_file, :table_name, :fingerprint, now())
+        ON CONFLICT (source_file) DO UPDATE
+        SET table_name = EXCLUDED.table_name,
+            fingerprint = EXCLUDED.fingerprint,
+            loaded_at = EXCLUDED.loaded_at;
+    '''), {"source_file": csv_file, "table_name": table_name, "fingerprint": file_fingerprint})
+
+
+def bump_data_version(conn):
+    """Increment the data version (inside the caller's transaction) and return it."""
+    return conn.execute(text(f'''
+        UPDATE {VERSION_TABLE} SET version = version + 1, refreshed_at = now()
+        RETURNING version;
+    ''')).scalar()
+
+
+def read_dataset(csv_file):
+    """Read one CMS CSV from the data folder with typed claim counts and ages (see clean_data.py)."""
     df = pd.read_csv(os.path.join(data_folder, csv_file), low_memory=False)
-    df.to_sql(table_name, engine, if_exists='replace', index=False, chunksize=50000)
-    print(f"Table {table_name} loaded successfully.")
+    return clean_dataset(df, claim_counts=datasets.get(csv_file) in transparency_markets)
+
+
+def partition_name(table_name, value):
+    """Name of the partition of table_name holding rows for value (e.g. rate_puf_tx)."""
+    return f"{table_name}_{str(value).lower()}"
+
+
+def list_partitions(conn, table_name):
+    """Return the names of the partitions attached to table_name."""
+    rows = conn.execute(text('''
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        WHERE parent.relname = :table_name;
+    '''), {"table_name": table_name})
+    return [row[0] for row in rows]
+
+
+def rename_table(conn, table_name, new_name):
+    """Rename a table, renaming its partitions (if any) to match."""
+    for partition in list_partitions(conn, table_name):
+        if partition.startswith(table_name + "_"):
+            suffix = partition[len(table_name):]
+            conn.execute(text(f'ALTER TABLE "{partition}" RENAME TO "{new_name}{suffix}"'))
+    conn.execute(text(f'ALTER TABLE "{table_name}" RENAME TO "{new_name}"'))
+
+
+def create_partitioned_table(df, table_name, engine, partition_column):
+    """Create table_name list-partitioned on partition_column, one partition per value in df."""
+    create_sql = pd.io.sql.get_schema(df, table_name, con=engine).strip().rstrip(";")
+    with engine.begin() as conn:
+        conn.execute(text(f'DROP TABLE IF EXISTS "{table_name}" CASCADE'))
+        conn.execute(text(f'{create_sql} PARTITION BY LIST ("{partition_column}")'))
+        for value in sorted(df[partition_column].dropna().unique()):
+            conn.execute(text(
+                f'CREATE TABLE "{partition_name(table_name, value)}" PARTITION OF "{table_name}" '
+                f"FOR VALUES IN ('{value}')"
+            ))
+        # Catches NULLs and any state first seen in a later per-state reload
+        conn.execute(text(
+            f'CREATE TABLE "{partition_name(table_name, "default")}" PARTITION OF "{table_name}" DEFAULT'
+        ))
+
+
+def build_indexes(conn, table_name, index_as=None):
+    """Create the configured indexes on table_name and refresh its statistics."""
+    for columns in table_indexes.get(index_as or table_name, []):
+        column_list = ", ".join(f'"{column}"' for column in columns)
+        # Unnamed so Postgres picks a unique name; shadow tables keep theirs after the swap.
+        # On a partitioned table this creates a matching index on every partition.
+        conn.execute(text(f'CREATE INDEX ON "{table_name}" ({column_list})'))
+    conn.execute(text(f'ANALYZE "{table_name}"'))
+
+
+def write_table(df, table_name, engine, index_as=None):
+    """
+    Write df to table_name, then build its indexes and refresh planner statistics.
+    index_as names the table whose index list applies (used when loading a shadow copy).
+    """
+    partition_column = partitioned_tables.get(index_as or table_name) if PARTITION_LARGE_TABLES else None
+    if partition_column:
+        create_partitioned_table(df, table_name, engine, partition_column)
+        df.to_sql(table_name, engine, if_exists='append', index=False, chunksize=50000)
+    else:
+        df.to_sql(table_name, engine, if_exists='replace', index=False, chunksize=50000)
+    with engine.begin() as conn:
+        build_indexes(conn, table_name, index_as=index_as)
+
+
+def partition_for(conn, table_name, value):
+    """
+    The table holding table_name's rows for value: its partition, the default partition
+    for values without one (new states land there until the next full load), or the table
+    itself when it is unpartitioned (PARTITION_LARGE_TABLES = False).
+    """
+    partitions = list_partitions(conn, table_name)
+    if not partitions:
+        return table_name
+    partition = partition_name(table_name, value)
+    return partition if partition in partitions else partition_name(table_name, "default")
+
+
+def reload_partition(df, table_name, value, engine):
+    """
+    Replace the rows of one partition (e.g. one state's rates) with df, returning the
+    table that was rewritten (see partition_for).
+    The delete and insert commit together with a data version bump, so readers see either
+    the old or new rows and API caches keyed on the version drop the old ones.
+    """
+    partition_column = partitioned_tables[table_name]
+    df = df[df[partition_column] == value]
+    with engine.begin() as conn:
+        partition = partition_for(conn, table_name, value)
+        conn.execute(text(f'DELETE FROM "{partition}" WHERE "{partition_column}" = :value'), {"value": value})
+        df.to_sql(table_name, conn, if_exists='append', index=False, chunksize=50000)
+        bump_data_version(conn)
+    return partition
+
+
+def build_transparency_fact(engine, source_tables):
+    """
+    Stack every transparency table into one table with a market column and a single,
+    normalized set of column names, so all-market issuer lookups are one indexed query.
+    Several years of one market can be loaded side by side; plan_year (from the table
+    name, NULL when it has none) tells them apart. source_tables maps source tables to the table to read them from (the live table,
+    or its shadow copy during a refresh).
+    """
+    frames = []
+    for table_name, market in transparency_markets.items():
+        # Loaded tables already have normalized headers; this covers tables loaded before that
+        df = pd.read_sql_table(source_tables.get(table_name, table_name), engine)
+        df = df.rename(columns=normalize_column)
+        df = df.loc[:, ~df.columns.duplicated()]
+        df.insert(0, "market", market)
+        df.insert(1, "source_table", table_name)
+        df.insert(2, "plan_year", pd.Series(plan_year(table_name), index=df.index, dtype="Int64"))
+        frames.append(df)
+    return pd.concat(frames, ignore_index=True)
+
+
+def build_plan_quality_metrics(engine, source_tables):
+    """
+    One row per transparency plan with numeric claim metrics, so rankings can filter,
+    sort and limit in SQL. A plan present in several plan years keeps its latest year.
+    """
+    df = pd.read_sql_table(source_tables.get("transparency_fact", "transparency_fact"), engine)
+    # Claim counts are numeric since load (suppressed counts are NULL)
+    received_in = df["Plan_Number_Claims_Received_In_Network"].astype(float)
+    received_out = df["Plan_Number_Claims_Received_Out_of_Network"].astype(float)
+    denied = (df["Plan_Number_Claims_Denied_In_Network"].astype(float)
+              + df["Plan_Number_Claims_Denied_Out_of_Network"].astype(float))
+    resubmitted = (df["Plan_Number_Claims_Resubmitted_In_Network"].astype(float)
+                   + df["Plan_Number_Claims_Resubmitted_Out_of_Network"].astype(float))
+    received = received_in + received_out
+
+    metrics = pd.DataFrame({
+        "market": df["market"],
+        "plan_year": df["plan_year"],
+        # HIOS plan IDs embed the state code, e.g. 12345TX0010001
+        "state_code": df["Plan_ID"].astype(str).str[5:7].str.upper(),
+        "issuer_id": df["Issuer_ID"].astype(str),
+        "issuer_name": df.get("Issuer_Name"),
+        "plan_id": df["Plan_ID"].astype(str),
+        "plan_name": df.get("Plan_Name"),
+        "metal_level": df.get("Metal_Level"),
+        "claims_received": received,
+        "denial_rate": denied / received,
+        "resubmission_rate": resubmitted / received,
+        "out_of_network_pct": received_out / received,
+    })
+    # Same rule as the client: only plans with complete, non-zero claim counts
+    metrics = metrics[(received > 0) & denied.notna() & resubmitted.notna() & df["Plan_ID"].notna()]
+    metrics = metrics.sort_values("plan_year", ascending=False, na_position="last", kind="stable")
+    return metrics.drop_duplicates(subset=["market", "plan_id"]).sort_index().reset_index(drop=True)
+
+
+# Plan ID matches tried in order when looking up a transparency plan's premium: the exact
+# ID, then its first 10 characters, which only counts when a single rate plan has that prefix
+PREMIUM_MATCHES = [("exact", None), ("plan_prefix", 10)]
+ISSUER_ID_LENGTH = 5
+
+
+def build_plan_rankings(engine, source_tables):
+    """
+    Read model for /rankings: one row per (transparency plan, age 0..AGE_OPEN_MAX) with
+    the plan's metrics, its lowest non-tobacco premium for that age across rating areas,
+    and value_score = premium / (1 - denial_rate). With an index per sort key on
+    (state_code, age, key), a ranking is an index-ordered scan that stops at the limit.
+    premium_match records which plan ID match found the premium (NULL when none did).
+    issuer_min_premium is the issuer's lowest premium for the age, for reference only: it
+    is another plan's price, so it never feeds premium, value_score or the filters.
+    """
+    metrics = pd.read_sql_table(source_tables.get("plan_quality_metrics", "plan_quality_metrics"), engine)
+    rates = pd.read_sql_query(text(f'''
+        SELECT "PlanId", "AgeMin", "AgeMax", MIN("IndividualRate") AS premium
+        FROM "{source_tables.get("rate_puf", "rate_puf")}"
+        WHERE "AgeMin" IS NOT NULL
+        AND ("Tobacco" = 'No' OR "Tobacco" = 'Tobacco User/Non-Tobacco User')
+        GROUP BY "PlanId", "AgeMin", "AgeMax";
+    '''), engine)
+
+    # Expand each rate age band to one row per age
+    band_sizes = (rates["AgeMax"].clip(upper=AGE_OPEN_MAX) - rates["AgeMin"] + 1).clip(lower=0).astype(int)
+    by_age = rates.loc[rates.index.repeat(band_sizes)].reset_index(drop=True)
+    by_age["age"] = (by_age["AgeMin"] + by_age.groupby(["PlanId", "AgeMin"]).cumcount()).astype(int)
+    by_age["PlanId"] = by_age["PlanId"].astype(str)
+
+    def premiums_by(length, unique):
+        """Lowest premium per (plan ID prefix, age); with unique, only prefixes of a single rate plan."""
+        keyed = by_age.assign(key=by_age["PlanId"].str[:length])
+        if unique:
+            plans_per_key = keyed.groupby("key")["PlanId"].nunique()
+            keyed = keyed[keyed["key"].isin(plans_per_key.index[plans_per_key == 1])]
+        return keyed.groupby(["key", "age"], as_index=False)["premium"].min()
+
+    def lookup(premiums, length):
+        plan_keys = rankings["plan_id"].str[:length].where(rankings["plan_id"].str.len() >= (length or 0))
+        return rankings[["age"]].assign(key=plan_keys).merge(premiums, on=["key", "age"], how="left")["premium"]
+
+    rankings = metrics.merge(pd.DataFrame({"age": range(AGE_OPEN_MAX + 1)}), how="cross")
+    rankings["premium"] = np.nan
+    rankings["premium_match"] = None
+    for match, length in PREMIUM_MATCHES:
+        found = lookup(premiums_by(length, unique=length is not None), length)
+        fill = rankings["premium"].isna().to_numpy() & found.notna().to_numpy()
+        rankings.loc[fill, "premium"] = found[fill].to_numpy()
+        rankings.loc[fill, "premium_match"] = match
+    rankings["issuer_min_premium"] = lookup(premiums_by(ISSUER_ID_LENGTH, unique=False), ISSUER_ID_LENGTH).to_numpy()
+
+    rankings["value_score"] = rankings["premium"] / (1 - rankings["denial_rate"]).where(rankings["denial_rate"] < 1)
+    return rankings
+
+
+def fips_code(series):
+    """County FIPS codes as 5-character text (CSV parsing turns 01001 into 1001.0)."""
+    return pd.to_numeric(series, errors="coerce").astype("Int64").astype("string").str.zfill(5)
+
+
+def build_plan_availability(engine, source_tables):
+    """
+    Join table of where each plan is sold: one row per (state, county, ZIP, plan), with
+    ZipCode NULL when the plan covers the whole county. Whole-state service areas are
+    expanded to every county that appears for that state in the service area file, and
+    partial-county service areas to their listed ZIP codes. Plan details are copied in so
+    county lookups need no join at request time.
+    """
+    service_areas = pd.read_sql_query(text(f'''
+        SELECT "StateCode", "IssuerId", "ServiceAreaId", "MarketCoverage", "DentalOnlyPlan",
+               "CoverEntireState", "County", "PartialCounty", "ZipCodes"
+        FROM "{source_tables.get("service_area_puf", "service_area_puf")}";
+    '''), engine)
+    plans = pd.read_sql_query(text(f'''
+        SELECT DISTINCT "StateCode", "IssuerId", "ServiceAreaId", "StandardComponentId" AS "PlanId",
+               "PlanMarketingName", "MetalLevel", "PlanType", "MarketCoverage", "DentalOnlyPlan"
+        FROM "{source_tables.get("plan_attributes_puf", "plan_attributes_puf")}";
+    '''), engine)
+
+    service_areas["County"] = fips_code(service_areas["County"])
+    whole_state = service_areas["CoverEntireState"].astype(str).str.lower() == "yes"
+    state_counties = service_areas.loc[service_areas["County"].notna(), ["StateCode", "County"]].drop_duplicates()
+    counties = pd.concat([
+        service_areas[whole_state].drop(columns=["County"]).merge(state_counties, on="StateCode")
+            .assign(PartialCounty="No", ZipCodes=None),
+        service_areas[~whole_state & service_areas["County"].notna()],
+    ], ignore_index=True)
+
+    # Partial counties list their ZIP codes; without a list, fall back to the whole county
+    zip_lists = counties["ZipCodes"].astype("string").str.findall(r"\d+")
+    partial = (counties["PartialCounty"].astype(str).str.lower() == "yes") & (zip_lists.str.len() > 0)
+    whole_county = counties[~partial].assign(ZipCode=None)
+    by_zip = counties[partial].assign(ZipCode=zip_lists[partial]).explode("ZipCode")
+    by_zip["ZipCode"] = by_zip["ZipCode"].str.zfill(5)
+
+    coverage = pd.concat([whole_county, by_zip], ignore_index=True)
+    # Issuers reuse ServiceAreaIds across markets (e.g. individual and SHOP, medical and
+    # dental), so a plan is only sold where a service area of its own market covers
+    area_keys = ["StateCode", "IssuerId", "ServiceAreaId", "MarketCoverage", "DentalOnlyPlan"]
+    coverage = coverage[area_keys[:1] + ["County", "ZipCode"] + area_keys[1:]].drop_duplicates()
+    availability = coverage.merge(plans, on=area_keys)
+    return availability.drop_duplicates().reset_index(drop=True)
+
+
+def benefit_search_name(series):
+    """Lowercase benefit names with punctuation collapsed to single spaces (matched by /benefit-search)."""
+    return series.astype("string").str.lower().str.replace(r"[^a-z0-9]+", " ", regex=True).str.strip()
+
+
+def build_benefit_names(engine, source_tables):
+    """Dictionary of distinct benefit names, each with a numeric benefit_id for the posting lists."""
+    names = pd.read_sql_query(text(f'''
+        SELECT DISTINCT "BenefitName"
+        FROM "{source_tables.get("benefits_and_cost_sharing", "benefits_and_cost_sharing")}"
+        WHERE "BenefitName" IS NOT NULL
+        ORDER BY "BenefitName";
+    '''), engine)
+    names.insert(0, "benefit_id", range(1, len(names) + 1))
+    names["search_name"] = benefit_search_name(names["BenefitName"])
+    return names
+
+
+def build_benefit_postings(engine, source_tables):
+    """
+    Inverted index over benefits_and_cost_sharing: one row per (benefit, state, plan) for
+    every covered benefit. Benefit searches match names in the small benefit_names table,
+    then read only the matching benefits' plans from here instead of scanning the benefits table.
+    """
+    names = pd.read_sql_table(source_tables.get("benefit_names", "benefit_names"), engine)
+    covered = pd.read_sql_query(text(f'''
+        SELECT DISTINCT "BenefitName", "StateCode", "IssuerId", "StandardComponentId" AS "PlanId"
+        FROM "{source_tables.get("benefits_and_cost_sharing", "benefits_and_cost_sharing")}"
+        WHERE "IsCovered" = 'Covered';
+    '''), engine)
+    postings = covered.merge(names[["benefit_id", "BenefitName"]], on="BenefitName")
+    return postings[["benefit_id", "StateCode", "PlanId", "IssuerId"]].reset_index(drop=True)
+
+
+# Tables computed from other tables after they load, in build order: {table: (builder, source tables)}
+derived_tables = {
+    "transparency_fact": (build_transparency_fact, list(transparency_markets)),
+    "plan_quality_metrics": (build_plan_quality_metrics, ["transparency_fact"]),
+    "plan_rankings": (build_plan_rankings, ["plan_quality_metrics", "rate_puf"]),
+    "plan_availability": (build_plan_availability, ["service_area_puf", "plan_attributes_puf"]),
+    "benefit_names": (build_benefit_names, ["benefits_and_cost_sharing"]),
+    "benefit_postings": (build_benefit_postings, ["benefits_and_cost_sharing", "benefit_names"]),
+}
+
+
+def load_all(engine):
+    """
+    Load each CSV into PostgreSQL, replacing the existing tables, then record the file
+    fingerprints and bump the data version so API caches and ETags move on.
+    Returns the new data version.
+    """
+    ensure_metadata_tables(engine)
+    loaded = []
+    for csv_file, table_name in datasets.items():
+        print(f"Loading {csv_file} into table {table_name}...")
+        file_fingerprint = fingerprint(os.path.join(data_folder, csv_file))
+        write_table(read_dataset(csv_file), table_name, engine)
+        loaded.append((csv_file, table_name, file_fingerprint))
+        print(f"Table {table_name} loaded successfully.")
+
+    for table_name, (builder, _) in derived_tables.items():
+        print(f"Building derived table {table_name}...")
+        write_table(builder(engine, {}), table_name, engine)
+        print(f"Table {table_name} built successfully.")
+
+    with engine.begin() as conn:
+        for csv_file, table_name, file_fingerprint in loaded:
+            record_fingerprint(conn, csv_file, table_name, file_fingerprint)
+        return bump_data_version(conn)
+
 
-engine.dispose()
-print("All CSVs loaded into PostgreSQL.")
\ No newline at end of file
+if __name__ == "__main__":
+    engine = create_engine(DATABASE_URL)
+    version = load_all(engine)
+    engine.dispose()
+    print(f"All CSVs loaded into PostgreSQL. Data version is now {version}.")
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Incremental, zero-downtime refresh of the PostgreSQL tables from the CSVs in data/.
+
+Each source file is fingerprinted (size + SHA-256) and only files whose fingerprint
+changed since the last refresh are reloaded. A changed file is loaded into a shadow
+table, indexed and analyzed while the API keeps reading the live table. All shadow
+tables are then renamed into place in a single transaction that also records the new
+fingerprints and bumps the data version, so readers see either the old data or the
+new data and never a missing or half-loaded table. Derived tables (see derived_tables
+in load_data_pgs.py) are rebuilt from the new shadow tables when any of their sources
+changed and are swapped in the same transaction.
+
+Usage:
+    python refresh_data.py            # reload changed files only
+    python refresh_data.py --force    # reload every file
+    python refresh_data.py --dry-run  # report what would be reloaded
+"""
+import argparse
+import os
+import time
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, text
+
+from load_data_pgs import (DATABASE_URL, FINGERPRINT_TABLE, bump_data_version, data_folder, datasets,
+                           derived_tables, ensure_metadata_tables, fingerprint, read_dataset,
+                           record_fingerprint, rename_table, write_table)
+
+load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))
+
+SHADOW_SUFFIX = "__shadow"
+OLD_SUFFIX = "__old"
+
+# Renames need an exclusive lock; don't queue behind a long-running API query forever
+SWAP_LOCK_TIMEOUT = "5s"
+SWAP_RETRIES = 5
+
+
+def stored_fingerprints(engine):
+    """Return {source_file: fingerprint} as of the last successful refresh."""
+    with engine.connect() as conn:
+        rows = conn.execute(text(f"SELECT source_file, fingerprint FROM {FINGERPRINT_TABLE}"))
+        return {row[0]: row[1] for row in rows}
+
+
+def find_changed_files(engine, force=False):
+    """Return [(csv_file, table_name, fingerprint)] for files that need reloading."""
+    previous = stored_fingerprints(engine)
+    changed = []
+    for csv_file, table_name in datasets.items():
+        path = os.path.join(data_folder, csv_file)
+        if not os.path.exists(path):
+            print(f"Skipping {csv_file}: file not found")
+            continue
+        current = fingerprint(path)
+        if force or previous.get(csv_file) != current:
+            changed.append((csv_file, table_name, current))
+    return changed
+
+
+def drop_table(conn, table_name):
+    conn.execute(text(f'DROP TABLE IF EXISTS "{table_name}" CASCADE'))
+
+
+def table_exists(conn, table_name):
+    return conn.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": f'"{table_name}"'}).scalar()
+
+
+def swap_in(conn, table_name):
+    """Rename the shadow copy of table_name (and its partitions) into place and drop the old table."""
+    shadow = table_name + SHADOW_SUFFIX
+    old = table_name + OLD_SUFFIX
+    drop_table(conn, old)
+    if table_exists(conn, table_name):
+        rename_table(conn, table_name, old)
+    rename_table(conn, shadow, table_name)
+    drop_table(conn, old)
+
+
+def publish(engine, loaded):
+    """
+    Swap every loaded shadow table into place, record fingerprints and bump the data
+    version, all in one transaction. Retries if the table locks can't be taken in time.
+    Returns the new data version.
+    """
+    for attempt in range(1, SWAP_RETRIES + 1):
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(f"SET LOCAL lock_timeout = '{SWAP_LOCK_TIMEOUT}'"))
+                for csv_file, table_name, file_fingerprint in loaded:
+                    swap_in(conn, table_name)
+                    if csv_file is None:
+                        # Derived table, nothing to fingerprint
+                        continue
+                    record_fingerprint(conn, csv_file, table_name, file_fingerprint)
+                return bump_data_version(conn)
+        except Exception as e:
+            if attempt == SWAP_RETRIES:
+                raise
+            print(f"  - Swap attempt {attempt}/{SWAP_RETRIES} failed ({e}), retrying...")
+            time.sleep(attempt)
+
+
+def drop_shadows(engine, table_names):
+    """Drop the shadow copies of table_names and of every derived table."""
+    with engine.begin() as conn:
+        for table_name in list(table_names) + list(derived_tables):
+            drop_table(conn, table_name + SHADOW_SUFFIX)
+
+
+def rebuild_derived_tables(engine, changed_tables, shadow_sources):
+    """
+    Build shadow copies of the derived tables whose sources are in changed_tables.
+    shadow_sources maps changed sources to the table holding their new data (their shadow
+    copy during a refresh; empty when the live tables were updated in place).
+    Returns the entries to pass to publish().
+    """
+    changed_tables = set(changed_tables)
+    shadow_sources = dict(shadow_sources)
+    loaded = []
+    for table_name, (builder, sources) in derived_tables.items():
+        if changed_tables.intersection(sources):
+            print(f"Rebuilding derived table {table_name}...")
+            write_table(builder(engine, shadow_sources), table_name + SHADOW_SUFFIX, engine,
+                        index_as=table_name)
+            loaded.append((None, table_name, None))
+            # Later derived tables may be built from this one
+            changed_tables.add(table_name)
+            shadow_sources[table_name] = table_name + SHADOW_SUFFIX
+    return loaded
+
+
+def refresh_derived_tables(engine, changed_tables):
+    """
+    Rebuild and swap in the derived tables built from changed_tables after those were
+    updated in place (e.g. by reload_state.py). Returns the new data version, or None
+    when no derived table depends on them.
+    """
+    try:
+        loaded = rebuild_derived_tables(engine, changed_tables, {})
+        if not loaded:
+            return None
+        return publish(engine, loaded)
+    except Exception:
+        drop_shadows(engine, [])
+        raise
+
+
+def refresh(engine, force=False, dry_run=False):
+    ensure_metadata_tables(engine)
+    changed = find_changed_files(engine, force=force)
+    if not changed:
+        print("All tables are up to date.")
+        return None
+
+    print(f"{len(changed)} of {len(datasets)} files changed:")
+    for csv_file, table_name, _ in changed:
+        print(f"  - {csv_file} -> {table_name}")
+    if dry_run:
+        return None
+
+    loaded = []
+    try:
+        for csv_file, table_name, file_fingerprint in changed:
+            shadow = table_name + SHADOW_SUFFIX
+            start = time.time()
+            print(f"Loading {csv_file} into shadow table {shadow}...")
+            write_table(read_dataset(csv_file), shadow, engine, index_as=table_name)
+            loaded.append((csv_file, table_name, file_fingerprint))
+            print(f"  - Loaded in {time.time() - start:.1f}s")
+
+        # Rebuild derived tables from the new shadow copies of whichever sources changed
+        changed_tables = {table_name for _, table_name, _ in changed}
+        shadow_sources = {table_name: table_name + SHADOW_SUFFIX for table_name in changed_tables}
+        loaded += rebuild_derived_tables(engine, changed_tables, shadow_sources)
+
+        version = publish(engine, loaded)
+    except Exception:
+        # Leave the live tables untouched and clean up any partial shadows
+        drop_shadows(engine, [table_name for _, table_name, _ in changed])
+        raise
+
+    print(f"Swapped in {len(loaded)} tables. Data version is now {version}.")
+    return version
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reload changed CMS CSVs without downtime.")
+    parser.add_argument("--force", action="store_true", help="reload every file, changed or not")
+    parser.add_argument("--dry-run", action="store_true", help="only report which files changed")
+    args = parser.parse_args()
+
+    engine = create_engine(os.getenv("DATABASE_URL", DATABASE_URL))
+    try:
+        refresh(engine, force=args.force, dry_run=args.dry_run)
+    finally:
+        engine.dispose()
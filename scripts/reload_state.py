@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Per-state maintenance for the state-partitioned tables (rate_puf, benefits_and_cost_sharing).
+
+Usage:
+    python reload_state.py TX                 # reload TX rows from the CSVs, then VACUUM ANALYZE
+    python reload_state.py TX --vacuum-only   # only VACUUM ANALYZE the TX partitions
+    python reload_state.py TX --table rate_puf
+
+A reload bumps the data version with each partition it rewrites and rebuilds the derived
+tables built from the reloaded tables (see derived_tables in load_data_pgs.py). Tables
+loaded unpartitioned (PARTITION_LARGE_TABLES = False) are reloaded and vacuumed whole.
+"""
+import argparse
+import os
+import time
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, text
+
+from load_data_pgs import (DATABASE_URL, datasets, ensure_metadata_tables, partition_for, partitioned_tables,
+                           read_dataset, reload_partition)
+from refresh_data import refresh_derived_tables
+
+load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))
+
+
+def vacuum_partition(engine, partition):
+    """VACUUM ANALYZE a single partition or table (VACUUM can't run inside a transaction)."""
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(f'VACUUM (ANALYZE) "{partition}"'))
+
+
+def reload_state(engine, state_code, table_names, vacuum_only=False):
+    csv_for_table = {table_name: csv_file for csv_file, table_name in datasets.items()}
+    if not vacuum_only:
+        ensure_metadata_tables(engine)
+
+    for table_name in table_names:
+        start = time.time()
+        if vacuum_only:
+            with engine.connect() as conn:
+                partition = partition_for(conn, table_name, state_code)
+        else:
+            print(f"Reloading {state_code} rows of {table_name} from {csv_for_table[table_name]}...")
+            partition = reload_partition(read_dataset(csv_for_table[table_name]), table_name, state_code, engine)
+        print(f"Vacuuming {partition}...")
+        vacuum_partition(engine, partition)
+        print(f"  - Done in {time.time() - start:.1f}s")
+
+    if not vacuum_only:
+        # e.g. benefit_names / benefit_postings are built from benefits_and_cost_sharing
+        version = refresh_derived_tables(engine, table_names)
+        if version is not None:
+            print(f"Rebuilt derived tables. Data version is now {version}.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reload or vacuum one state's partitions.")
+    parser.add_argument("state_code", help="two-letter state code, e.g. TX")
+    parser.add_argument("--table", choices=sorted(partitioned_tables), action="append",
+                        help="limit to one partitioned table (repeatable); defaults to all")
+    parser.add_argument("--vacuum-only", action="store_true", help="skip the reload, only VACUUM ANALYZE")
+    args = parser.parse_args()
+
+    engine = create_engine(os.getenv("DATABASE_URL", DATABASE_URL))
+    try:
+        reload_state(engine, args.state_code.upper(), args.table or sorted(partitioned_tables),
+                     vacuum_only=args.vacuum_only)
+    finally:
+        engine.dispose()